@@ -0,0 +1,78 @@
+"""Import-time benchmark for the sidecar entry point.
+
+Runs ``python -X importtime -c "import palette_sidecar.api"`` in fresh interpreters and
+reports the median cumulative import cost plus the slowest modules. Exits non-zero when
+the median exceeds ``--budget-ms`` or when a module that must stay lazy (the Claude SDK
+and its MCP stack) is imported at module load.
+
+    uv run python benchmarks/import_time.py --runs 7 --budget-ms 900
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+TARGET = "palette_sidecar.api"
+LAZY_MODULES = ("claude_code_sdk", "mcp")
+
+
+def profile_once(target: str) -> dict[str, int]:
+    """Return cumulative import time in microseconds keyed by module name."""
+
+    with tempfile.TemporaryDirectory() as home:
+        # A throwaway HOME proves importing never touches ~/.palette-app.
+        env = {**os.environ, "HOME": home}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+            capture_output=True,
+            text=True,
+            env=env,
+            check=True,
+        )
+        if os.listdir(home):
+            raise SystemExit(f"importing {target} wrote to HOME: {os.listdir(home)}")
+
+    timings: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        timings[name.strip()] = int(cumulative_us)
+    return timings
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    runs = [profile_once(TARGET) for _ in range(args.runs)]
+    totals_ms = [run[TARGET] / 1000 for run in runs]
+    median_ms = statistics.median(totals_ms)
+
+    print(f"{TARGET}: median {median_ms:.1f} ms over {args.runs} runs (min {min(totals_ms):.1f} ms)")
+    last = runs[-1]
+    top_level = {name: us for name, us in last.items() if "." not in name or name.startswith("palette_sidecar")}
+    for name, us in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[: args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    leaked = sorted(name for name in last if name.split(".")[0] in LAZY_MODULES)
+    if leaked:
+        print(f"FAIL: lazy modules imported at module load: {', '.join(leaked[:5])}")
+        failed = True
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        print(f"FAIL: median {median_ms:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
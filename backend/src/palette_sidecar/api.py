@@ -2,97 +2,292 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
-from contextlib import asynccontextmanager
+import logging
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+from importlib import import_module
 from pathlib import Path
 from typing import Any
 
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, Header, HTTPException, status
 from fastapi.responses import JSONResponse, StreamingResponse
 
-from .claude_service import session
+from .circuit import circuit_breaker
+from .claude_service import session, workspace_sessions
 from .config import (
+    COORDINATION_ENABLED,
+    DEBUG_SURFACE_ENABLED,
+    HOOK_LOG_LEVEL,
+    MCP_POOL_ENABLED,
     apply_environment,
-    detect_prerequisites,
+    ensure_cli_environment,
     ensure_workspace,
-    load_settings,
     register_always_allow,
-    save_settings,
     settings_response_payload,
+    settings_store,
 )
-from .models import ApprovalPayload, QueryPayload, SettingsPayload
+from .coordination import PERMISSION_OWNERSHIP, SESSION_OWNERSHIP, coordinator
+from .hook_log import HOOK_LOG_FILE, hook_log
+from .mcp_pool import mcp_pool
+from .models import ApprovalPayload, CancelPayload, QueryPayload, SettingsPayload
 from .permissions import broker
+from .probes import prober
+from .rate_limit import rate_limiter
+from .resume import resume_store
+from .tool_results import iter_file, parse_range, tool_results
 
+WORKER_COUNT_INTERVAL = 10.0
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Handle application lifecycle events."""
-    # Startup
-    await session.start()
-    yield
-    # Shutdown
-    await session.shutdown()
+_current_settings = settings_store.settings
+_workspace_path: Path | None = None
+# Streams this worker is running per palette session; the claim is released at zero.
+_local_streams: dict[str, int] = {}
 
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Familiar Sidecar", lifespan=lifespan)
 
-_current_settings = load_settings()
-_workspace_path: Path | None = None
+def _prepare_workspace() -> None:
+    global _workspace_path
 
-if _current_settings.workspace:
-    try:
-        _workspace_path = ensure_workspace(_current_settings.workspace)
-        _current_settings.workspace = str(_workspace_path)
-    except Exception as exc:  # pragma: no cover - defensive
-        raise RuntimeError(f"Failed to prepare workspace: {exc}") from exc
+    if not _current_settings.workspace:
+        _workspace_path = None
+        return
+    _workspace_path = ensure_workspace(_current_settings.workspace)
+    _current_settings.workspace = str(_workspace_path)
 
-if _current_settings.anthropic_api_key:
-    apply_environment(_current_settings.anthropic_api_key)
 
-if _workspace_path:
+def _configure_session() -> None:
     session.configure(
         api_key=_current_settings.anthropic_api_key,
         workspace=_workspace_path,
         always_allow=_current_settings.always_allow,
     )
-else:
-    session.configure(
+    workspace_sessions.configure(
         api_key=_current_settings.anthropic_api_key,
         always_allow=_current_settings.always_allow,
     )
 
-save_settings(_current_settings)
+
+def _sync_external_settings() -> None:
+    """Apply edits made to the config file outside the sidecar."""
+    global _workspace_path
+
+    if not settings_store.reload_if_changed():
+        return
+    apply_environment(_current_settings.anthropic_api_key)
+    try:
+        _prepare_workspace()
+    except Exception as exc:
+        logger.warning("Ignoring externally configured workspace: %s", exc)
+        _current_settings.workspace = None
+        _workspace_path = None
+    _configure_session()
+
+
+async def _warm_up() -> None:
+    """Load the Claude SDK and connect the client once the server is accepting requests."""
+
+    await asyncio.to_thread(import_module, "claude_code_sdk")
+    await session.reload_mcp_config()
+    await session.refresh_workspace_digest()
+    try:
+        await session.start()
+    except Exception as exc:  # pragma: no cover - retried on the first query
+        logger.warning("Claude client warm-up failed: %s", exc)
+    prober.invalidate()
+    await workspace_sessions.watch()
+
+
+async def _share_rate_limits() -> None:
+    """Keep this worker's rate-limit pacing at its share of the account's limits."""
+
+    while True:
+        try:
+            rate_limiter.set_workers(await coordinator.worker_count())
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Counting workers failed: %s", exc)
+        await asyncio.sleep(WORKER_COUNT_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Handle application lifecycle events."""
+    # Startup: keep this cheap so uvicorn can answer /health right away.
+    hook_log_file = HOOK_LOG_FILE
+    if COORDINATION_ENABLED:
+        # Rotation is not safe across processes, so each worker gets its own file.
+        hook_log_file = HOOK_LOG_FILE.with_name(f"hooks-{os.getpid()}.ndjson")
+    hook_log.start(hook_log_file, level=HOOK_LOG_LEVEL)
+    ensure_cli_environment()
+    settings_store.load()
+    resume_store.load()
+    try:
+        _prepare_workspace()
+    except Exception as exc:  # pragma: no cover - defensive
+        raise RuntimeError(f"Failed to prepare workspace: {exc}") from exc
+    # Only rewrites the file when workspace normalisation changed something.
+    settings_store.write_now()
+    if _current_settings.anthropic_api_key:
+        apply_environment(_current_settings.anthropic_api_key)
+    _configure_session()
+    if MCP_POOL_ENABLED:
+        await mcp_pool.start()
+    if COORDINATION_ENABLED:
+        await coordinator.start(
+            {"query": _remote_query, "approve": _remote_approve, "cancel": _remote_cancel}
+        )
+        broker.attach_coordinator(coordinator)
+    background = [asyncio.create_task(_warm_up()), asyncio.create_task(prober.run())]
+    if COORDINATION_ENABLED:
+        background.append(asyncio.create_task(_share_rate_limits()))
+    if DEBUG_SURFACE_ENABLED:
+        from .debug import lag_monitor
+
+        background.append(asyncio.create_task(lag_monitor.run()))
+    yield
+    # Shutdown
+    for task in background:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    broker.attach_coordinator(None)
+    await coordinator.stop()
+    await workspace_sessions.shutdown()
+    await session.shutdown()
+    await mcp_pool.shutdown()
+    await settings_store.flush()
+    await resume_store.flush()
+    hook_log.stop()
+
+
+app = FastAPI(title="Familiar Sidecar", lifespan=lifespan)
+
+if DEBUG_SURFACE_ENABLED:
+    from .debug import router as debug_router
+
+    app.include_router(debug_router)
 
 
 def _format_sse(event: dict[str, Any]) -> str:
     return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
 
 
+async def _local_events(
+    prompt: str, session_id: str, workspace: str | None = None
+) -> AsyncIterator[dict[str, Any]]:
+    # Another worker may have changed settings or resumed sessions since this one last looked.
+    _sync_external_settings()
+    resume_store.reload_if_changed()
+    _local_streams[session_id] = _local_streams.get(session_id, 0) + 1
+    try:
+        async with workspace_sessions.checkout(Path(workspace) if workspace else None) as target:
+            async for event in target.stream(prompt, session_id=session_id):
+                yield event
+    finally:
+        await _finish_local_stream(session_id)
+
+
+async def _finish_local_stream(session_id: str) -> None:
+    """Hand the session back once its last stream here ends, so any worker can serve it next."""
+
+    _local_streams[session_id] -= 1
+    if _local_streams[session_id]:
+        return
+    del _local_streams[session_id]
+    if coordinator.is_active:
+        # Save the conversation mapping first so the next worker resumes the right transcript.
+        await resume_store.flush()
+        if session_id not in _local_streams:
+            await coordinator.release(SESSION_OWNERSHIP, session_id)
+
+
+async def _routed_events(
+    prompt: str, session_id: str, workspace: str | None = None
+) -> AsyncIterator[dict[str, Any]]:
+    owner = await coordinator.claim(SESSION_OWNERSHIP, session_id)
+    if owner is None:
+        async for event in _local_events(prompt, session_id, workspace):
+            yield event
+        return
+    try:
+        async for event in coordinator.stream(
+            owner, "query", {"prompt": prompt, "session_id": session_id, "workspace": workspace}
+        ):
+            yield event
+    except OSError as exc:
+        logger.warning("Forwarding session %s to %s failed: %s", session_id, owner, exc)
+        yield {"type": "error", "message": "Session owner unavailable. Please try again."}
+
+
+def _remote_query(request: dict[str, Any]) -> AsyncIterator[dict[str, Any]]:
+    return _local_events(request["prompt"], request["session_id"], request.get("workspace"))
+
+
+async def _remote_approve(request: dict[str, Any]) -> dict[str, Any]:
+    try:
+        await _apply_approval(ApprovalPayload(**request))
+    except KeyError as exc:
+        return {"status": "not_found", "detail": str(exc)}
+    return {"status": "ok"}
+
+
+async def _remote_cancel(request: dict[str, Any]) -> dict[str, Any]:
+    cancelled = await workspace_sessions.cancel(request["session_id"])
+    return {"status": "ok" if cancelled else "idle"}
+
+
 @app.post("/query")
 async def query(payload: QueryPayload) -> StreamingResponse:
     session_id = payload.session_id or "default"
+    workspace: str | None = None
+    if payload.workspace:
+        try:
+            workspace = str(ensure_workspace(payload.workspace))
+        except Exception as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
     async def event_stream():
-        async for event in session.stream(payload.prompt, session_id=session_id):
+        async for event in _routed_events(payload.prompt, session_id, workspace):
             yield _format_sse(event)
 
     headers = {"Cache-Control": "no-cache", "Connection": "keep-alive"}
     return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
 
 
-@app.post("/approve")
-async def approve(payload: ApprovalPayload) -> dict[str, str]:
-    if payload.decision not in {"allow", "deny"}:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Decision must be 'allow' or 'deny'",
-        )
+@app.post("/cancel")
+async def cancel(payload: CancelPayload) -> dict[str, Any]:
+    session_id = payload.session_id or "default"
+    if await workspace_sessions.cancel(session_id):
+        return {"status": "ok"}
+    owner = await coordinator.owner_of(SESSION_OWNERSHIP, session_id)
+    if owner is None:
+        return {"status": "idle"}
+    return await _call_owner(owner, "cancel", {"session_id": session_id})
+
+
+async def _call_owner(owner: str, op: str, request: dict[str, Any]) -> dict[str, Any]:
+    """Forward to the owning worker; its socket can vanish while its process is still exiting."""
+
     try:
-        await broker.resolve(payload.request_id, payload.decision)
-    except KeyError as exc:  # pragma: no cover - defensive
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+        return await coordinator.call(owner, op, request)
+    except OSError as exc:
+        logger.warning("Forwarding %s to %s failed: %s", op, owner, exc)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Owning worker unavailable. Please try again.",
+        ) from exc
 
-    context = await session.notify_permission_resolution(
+
+async def _apply_approval(payload: ApprovalPayload) -> None:
+    """Resolve a permission owned by this worker; raises KeyError when it isn't pending here."""
+
+    await broker.resolve(payload.request_id, payload.decision)
+
+    target = workspace_sessions.session_for_request(payload.request_id) or session
+    context = await target.notify_permission_resolution(
         payload.request_id,
         payload.decision,
         remember=payload.remember,
@@ -103,14 +298,74 @@ async def approve(payload: ApprovalPayload) -> dict[str, str]:
         tool_name = context.get("tool")
         if path_value and tool_name:
             register_always_allow(_current_settings, tool=tool_name, path=Path(path_value))
-            save_settings(_current_settings)
-            session.configure(always_allow=_current_settings.always_allow)
+            settings_store.save()
+            _configure_session()
+
+
+@app.post("/approve")
+async def approve(payload: ApprovalPayload) -> dict[str, str]:
+    if payload.decision not in {"allow", "deny"}:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Decision must be 'allow' or 'deny'",
+        )
+    try:
+        await _apply_approval(payload)
+    except KeyError as exc:
+        owner = await coordinator.owner_of(PERMISSION_OWNERSHIP, payload.request_id)
+        if owner is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+        result = await _call_owner(owner, "approve", payload.model_dump())
+        if result.get("status") != "ok":
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=result.get("detail", str(exc))
+            ) from exc
 
     return {"status": "ok"}
 
 
+@app.get("/tool-result/{tool_use_id}")
+async def tool_result(
+    tool_use_id: str, range_header: str | None = Header(None, alias="Range")
+) -> StreamingResponse:
+    path = tool_results.path_for(tool_use_id)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown tool result")
+    try:
+        # `_prune` (in this or another worker) may delete the file at any time; once open,
+        # the handle keeps it readable for the rest of the response.
+        handle = path.open("rb")
+    except FileNotFoundError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Unknown tool result"
+        ) from exc
+    size = os.fstat(handle.fileno()).st_size
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError as exc:
+        handle.close()
+        raise HTTPException(
+            status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE,
+            detail="Unsatisfiable range",
+            headers={"Content-Range": f"bytes */{size}"},
+        ) from exc
+    start, end = byte_range or (0, size - 1)
+    headers = {"Accept-Ranges": "bytes", "Content-Length": str(max(end - start + 1, 0))}
+    status_code = status.HTTP_200_OK
+    if byte_range is not None:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+    return StreamingResponse(
+        iter_file(handle, start, end),
+        status_code=status_code,
+        media_type="text/plain; charset=utf-8",
+        headers=headers,
+    )
+
+
 @app.get("/settings")
 async def get_settings() -> dict[str, Any]:
+    _sync_external_settings()
     return settings_response_payload(_current_settings)
 
 
@@ -118,6 +373,7 @@ async def get_settings() -> dict[str, Any]:
 async def update_settings(payload: SettingsPayload) -> JSONResponse:
     global _workspace_path
 
+    _sync_external_settings()
     if payload.anthropic_api_key is not None:
         key = payload.anthropic_api_key.strip() or None
         _current_settings.anthropic_api_key = key
@@ -135,26 +391,37 @@ async def update_settings(payload: SettingsPayload) -> JSONResponse:
             except Exception as exc:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
-    save_settings(_current_settings)
-    if _workspace_path:
-        session.configure(
-            api_key=_current_settings.anthropic_api_key,
-            workspace=_workspace_path,
-            always_allow=_current_settings.always_allow,
-        )
-    else:
-        session.configure(
-            api_key=_current_settings.anthropic_api_key,
-            always_allow=_current_settings.always_allow,
-        )
+    settings_store.save()
+    _configure_session()
 
     await session.start()
+    prober.invalidate()
     return JSONResponse(settings_response_payload(_current_settings))
 
 
 @app.get("/health")
 async def health() -> dict[str, Any]:
-    checks = detect_prerequisites()
+    checks = prober.prerequisites
     missing = [name for name, ok in checks.items() if not ok]
-    status_value = "ok" if not missing else "degraded"
-    return {"status": status_value, "missing": missing}
+    circuit = circuit_breaker.snapshot()
+    status_value = "ok" if not missing and circuit["state"] == "closed" else "degraded"
+    return {
+        "status": status_value,
+        "missing": missing,
+        "mcpServers": mcp_pool.status(),
+        "workspaces": workspace_sessions.workspaces,
+        "circuit": circuit,
+        "rateLimits": rate_limiter.snapshot(),
+    }
+
+
+@app.get("/livez")
+async def livez() -> dict[str, Any]:
+    return prober.liveness()
+
+
+@app.get("/readyz")
+async def readyz() -> JSONResponse:
+    ready, payload = prober.readiness()
+    status_code = status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(payload, status_code=status_code)
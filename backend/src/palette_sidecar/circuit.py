@@ -0,0 +1,182 @@
+"""Circuit breaker and retry policy for the Claude client.
+
+All workspace sessions share one breaker, since they talk to the same CLI and upstream API.
+After `failure_threshold` consecutive retryable failures it opens and queries fail fast with a
+``retryAfter`` hint. Once the cool-down elapses a single probe is let through (half-open);
+success closes the circuit, failure reopens it with a doubled cool-down.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import time
+from collections.abc import Callable
+from typing import Any
+
+from .hook_log import hook_log
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 10.0
+MAX_RESET_TIMEOUT = 120.0
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 4.0
+
+# Upstream answers that will not improve by retrying the same request.
+_FATAL_MARKERS = (
+    "401",
+    "403",
+    "authentication",
+    "invalid x-api-key",
+    "invalid api key",
+    "permission_error",
+    "invalid_request_error",
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Claude client unavailable; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Transport drops, CLI crashes, timeouts and overload are retryable; the rest is fatal."""
+
+    from claude_code_sdk import CLIJSONDecodeError, CLINotFoundError
+    from claude_code_sdk._errors import MessageParseError
+
+    if isinstance(exc, (CLINotFoundError, CLIJSONDecodeError, MessageParseError)):
+        return False
+    if isinstance(exc, (ValueError, TypeError)):
+        return False
+    message = str(exc).lower()
+    return not any(marker in message for marker in _FATAL_MARKERS)
+
+
+def needs_reconnect(exc: BaseException) -> bool:
+    """Whether the error left the client's CLI transport unusable."""
+
+    from claude_code_sdk import CLIConnectionError, ProcessError
+
+    return isinstance(exc, (CLIConnectionError, ProcessError, ConnectionError, EOFError))
+
+
+def backoff_delay(attempt: int, *, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """Exponential backoff with equal jitter, so concurrent retries spread out."""
+
+    ceiling = min(cap, base * 2 ** max(attempt - 1, 0))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over Claude client health."""
+
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        max_reset_timeout: float = MAX_RESET_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._failure_threshold = failure_threshold
+        self._base_timeout = reset_timeout
+        self._max_timeout = max_reset_timeout
+        self._clock = clock
+        self._state = CLOSED
+        self._timeout = reset_timeout
+        self._opened_at = 0.0
+        self._failures = 0
+        self._probing = False
+        self._total_failures = 0
+        self._times_opened = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self.retry_after() == 0:
+            return HALF_OPEN
+        return self._state
+
+    def retry_after(self) -> float:
+        if self._state != OPEN:
+            return 0.0
+        return max(self._opened_at + self._timeout - self._clock(), 0.0)
+
+    def check(self) -> None:
+        """Raise `CircuitOpenError` if `acquire()` would, without taking the probe slot."""
+
+        remaining = self.retry_after()
+        if remaining > 0:
+            self._rejected += 1
+            raise CircuitOpenError(remaining)
+        if self.state == HALF_OPEN and self._probing:
+            self._rejected += 1
+            raise CircuitOpenError(min(self._base_timeout, 1.0))
+
+    def acquire(self) -> None:
+        """Admit one call, or raise `CircuitOpenError` while the circuit is open."""
+
+        if self._state == OPEN:
+            remaining = self.retry_after()
+            if remaining > 0:
+                self._rejected += 1
+                raise CircuitOpenError(remaining)
+            self._transition(HALF_OPEN)
+        if self._state == HALF_OPEN:
+            if self._probing:
+                self._rejected += 1
+                raise CircuitOpenError(min(self._base_timeout, 1.0))
+            self._probing = True
+
+    def release(self) -> None:
+        """End an admitted call that says nothing about client health (fatal error, cancel)."""
+
+        self._probing = False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probing = False
+        self._timeout = self._base_timeout
+        if self._state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._total_failures += 1
+        self._probing = False
+        if self._state == HALF_OPEN:
+            self._timeout = min(self._timeout * 2, self._max_timeout)
+            self._open()
+        elif self._state == CLOSED and self._failures >= self._failure_threshold:
+            self._open()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutiveFailures": self._failures,
+            "retryAfter": round(self.retry_after(), 1),
+            "failures": self._total_failures,
+            "opened": self._times_opened,
+            "rejected": self._rejected,
+        }
+
+    def _open(self) -> None:
+        self._opened_at = self._clock()
+        self._times_opened += 1
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        self._state = state
+        logger.info("Claude client circuit %s", state)
+        hook_log.log("circuit_state", state=state, failures=self._failures)
+
+
+circuit_breaker = CircuitBreaker()
@@ -4,30 +4,47 @@ from __future__ import annotations
 
 import asyncio
 import difflib
-import json
 import logging
-import os
-import re
-from contextlib import suppress
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager, suppress
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, AsyncIterator
+from typing import TYPE_CHECKING, Any
 from uuid import uuid4
 
-from claude_code_sdk import (
-    AssistantMessage,
-    ClaudeCodeOptions,
-    ClaudeSDKClient,
-    HookMatcher,
-    ResultMessage,
-    SystemMessage,
-    TextBlock,
-    ToolResultBlock,
-    ToolUseBlock,
+from .circuit import (
+    CircuitOpenError,
+    backoff_delay,
+    circuit_breaker,
+    is_retryable,
+    needs_reconnect,
 )
-
-from .config import apply_environment
+from .config import (
+    DEFAULT_MODEL,
+    MAX_WORKSPACE_SESSIONS,
+    WORKSPACE_DIGEST_ENABLED,
+    apply_environment,
+)
+from .hook_log import hook_log
+from .mcp_pool import mcp_pool
+from .mcp_registry import McpConfigStore, servers_digest
 from .permissions import broker
+from .rate_limit import RateLimitExceeded, Reservation, is_rate_limited, rate_limiter
+from .resume import resume_store
+from .tool_results import tool_results
+from .workspace_index import WorkspaceIndexer
+
+if TYPE_CHECKING:
+    # The SDK pulls in the full MCP stack; it is imported on first use so the
+    # sidecar can answer /health before it finishes loading.
+    from claude_code_sdk import (
+        AssistantMessage,
+        ClaudeCodeOptions,
+        ClaudeSDKClient,
+        McpServerConfig,
+    )
 
 STEEL_THREAD_SYSTEM_PROMPT = """
 You are the Claude Code engine behind a macOS command palette demo. Keep responses
@@ -37,6 +54,12 @@ end of each response.
 """.strip()
 
 MAX_QUERY_ATTEMPTS = 3
+SNIPPET_CHARS = 400
+MCP_RELOAD_INTERVAL = 2.0
+SWAP_BACKOFF_INITIAL = 2.0
+SWAP_BACKOFF_MAX = 300.0
+# How long a query waits for a new workspace's first scan before connecting without it.
+INITIAL_DIGEST_BUDGET = 0.5
 
 _UNSET = object()
 
@@ -59,19 +82,43 @@ class ToolContext:
     diff: str | None
 
 
+def _read_snippet(path: Path, chars: int = SNIPPET_CHARS) -> str | None:
+    """Tail of a file the tool just wrote, read without loading the whole file."""
+
+    try:
+        with path.open("rb") as handle:
+            handle.seek(0, 2)
+            size = handle.tell()
+            # UTF-8 needs at most four bytes per character.
+            handle.seek(max(size - chars * 4, 0))
+            tail = handle.read()
+    except OSError:
+        return None
+    return tail.decode("utf-8", errors="ignore")[-chars:]
+
+
 class ClaudeSession:
     """Manages a persistent ClaudeSDKClient connection and event stream."""
 
-    def __init__(self) -> None:
+    def __init__(self, mcp_store: McpConfigStore | None = None) -> None:
         self._config = SessionConfig()
-        self._options = ClaudeCodeOptions(
-            allowed_tools=["Write"],
-            permission_mode="default",
-            model="claude-sonnet-4-20250514",
-            system_prompt=STEEL_THREAD_SYSTEM_PROMPT,
-            mcp_servers=self._load_mcp_config(),
-        )
+        self._mcp_store = mcp_store or McpConfigStore()
+        self._mcp_servers: dict[str, McpServerConfig] = {}
         self._client: ClaudeSDKClient | None = None
+        self._mcp_digest = servers_digest(self._mcp_servers)
+        self._indexer: WorkspaceIndexer | None = None
+        self._index_task: asyncio.Task[bool] | None = None
+        self._workspace_digest = ""
+        self._workspace_digest_hash = ""
+        self._client_options_key: str | None = None
+        self._swap_task: asyncio.Task[None] | None = None
+        self._swap_failures = 0
+        self._swap_retry_at = 0.0
+        self._failed_swap_key: str | None = None
+        self._inflight = 0
+        self._active_stream: tuple[str, ClaudeSDKClient] | None = None
+        self._idle = asyncio.Event()
+        self._idle.set()
         self._receiver_task: asyncio.Task[None] | None = None
         self._event_queue: asyncio.Queue[dict[str, Any]] | None = None
         self._pending_tools: dict[str, ToolContext] = {}
@@ -79,10 +126,10 @@ class ClaudeSession:
         self._lock = asyncio.Lock()
         self._workspace_root: Path | None = None
         self._allow_rules: dict[str, set[str]] = {}
-
-        self._options.hooks = {
-            "PreToolUse": [HookMatcher(matcher="*", hooks=[self._handle_pre_tool_use])]
-        }
+        self._connect_ms: float | None = None
+        self._conversation: str | None = None
+        # SDK session the connected client is continuing (None: a fresh conversation).
+        self._client_conversation: str | None = None
 
     # ------------------------------------------------------------------
     # Configuration management
@@ -94,57 +141,220 @@ class ClaudeSession:
         workspace: Path | None | object = _UNSET,
         always_allow: dict[str, list[str]] | None | object = _UNSET,
     ) -> None:
+        # Only a new key or workspace needs a fresh client; allow rules are read per hook call.
+        restart = False
         if api_key is not _UNSET:
+            restart |= api_key != self._config.api_key
             self._config.api_key = api_key  # type: ignore[assignment]
             if api_key:
                 apply_environment(api_key)
         if workspace is not _UNSET:
             resolved = workspace.resolve() if workspace else None
+            if resolved != self._config.workspace:
+                restart = True
+                self._indexer = (
+                    WorkspaceIndexer(resolved) if resolved and WORKSPACE_DIGEST_ENABLED else None
+                )
+                self._workspace_digest = self._workspace_digest_hash = ""
             self._config.workspace = resolved  # type: ignore[assignment]
             self._workspace_root = resolved
-            self._options.cwd = str(resolved) if resolved else None
         if always_allow is not _UNSET:
-            value = always_allow or {}
-            self._config.always_allow = value  # type: ignore[assignment]
-            self._allow_rules = {
-                tool: {str(path) for path in paths}
-                for tool, paths in value.items()
+            self._config.always_allow = always_allow or {}  # type: ignore[assignment]
+        if workspace is not _UNSET or always_allow is not _UNSET:
+            self._rebuild_allow_rules()
+        if restart:
+            self._needs_restart = True
+
+    def _rebuild_allow_rules(self) -> None:
+        """Index the remembered approvals that fall inside this session's workspace."""
+
+        root = self._workspace_root
+        self._allow_rules = {
+            tool: {
+                str(path) for path in paths if root is None or Path(path).is_relative_to(root)
             }
-        self._needs_restart = True
+            for tool, paths in self._config.always_allow.items()
+        }
 
     @property
     def is_ready(self) -> bool:
         return self._config.api_key is not None and self._config.workspace is not None
 
-    def _load_mcp_config(self) -> dict[str, Any]:
-        """Load MCP server configuration from .mcp.json file with environment variable substitution."""
-        config_path = Path(__file__).parent.parent.parent.parent / ".mcp.json"
-        try:
-            if config_path.exists():
-                with open(config_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-
-                # Substitute environment variables (${VAR_NAME} format)
-                def replace_env_var(match):
-                    var_name = match.group(1)
-                    env_value = os.getenv(var_name)
-                    if env_value is None:
-                        logger.warning("Environment variable %s not found, skipping MCP server configuration", var_name)
-                        return ""
-                    return env_value
-
-                content = re.sub(r'\$\{([^}]+)\}', replace_env_var, content)
-
-                # Only proceed if we have valid content after substitution
-                if content and not content.isspace():
-                    config = json.loads(content)
-                    return config.get("mcpServers", {})
-                else:
-                    logger.info("MCP configuration skipped due to missing environment variables")
+    @property
+    def workspace(self) -> Path | None:
+        return self._workspace_root
+
+    @property
+    def is_connected(self) -> bool:
+        return self._client is not None and not self._needs_restart
+
+    @property
+    def connect_latency_ms(self) -> float | None:
+        return self._connect_ms
+
+    @property
+    def is_busy(self) -> bool:
+        return self._inflight > 0
+
+    @property
+    def pending_tool_count(self) -> int:
+        return len(self._pending_tools)
+
+    def has_pending_tool(self, request_id: str) -> bool:
+        return request_id in self._pending_tools
+
+    def _build_options(self) -> ClaudeCodeOptions:
+        from claude_code_sdk import ClaudeCodeOptions, HookMatcher
+
+        return ClaudeCodeOptions(
+            allowed_tools=["Write"],
+            permission_mode="default",
+            model=DEFAULT_MODEL,
+            system_prompt=self._system_prompt(),
+            mcp_servers=dict(self._mcp_servers),
+            cwd=str(self._workspace_root) if self._workspace_root else None,
+            resume=self._resume_id(),
+            hooks={"PreToolUse": [HookMatcher(matcher="*", hooks=[self._handle_pre_tool_use])]},
+        )
 
+    def _resume_id(self) -> str | None:
+        if self._workspace_root is None or self._conversation is None:
+            return None
+        return resume_store.lookup(self._workspace_root, self._conversation)
+
+    def _remember_conversation(self, session_id: str, sdk_session_id: Any) -> None:
+        if self._workspace_root is not None and isinstance(sdk_session_id, str) and sdk_session_id:
+            self._client_conversation = sdk_session_id
+            resume_store.record(self._workspace_root, session_id, sdk_session_id)
+
+    def _needs_resume(self) -> bool:
+        """Whether the connected client is not on the current palette session's conversation.
+
+        This is the case for the client connected at warm-up, before any query named a
+        session: after a sidecar restart it would otherwise start a new conversation and
+        overwrite the stored one.
+        """
+
+        if self._client is None or self._needs_restart:
+            return False
+        resume_id = self._resume_id()
+        return resume_id is not None and resume_id != self._client_conversation
+
+    def _system_prompt(self) -> str:
+        # Fixed text first, then the digest: identical bytes keep the prompt cache warm.
+        if not self._workspace_digest:
+            return STEEL_THREAD_SYSTEM_PROMPT
+        return f"{STEEL_THREAD_SYSTEM_PROMPT}\n\n{self._workspace_digest}"
+
+    def _options_key(self) -> str:
+        # The workspace digest is left out: it is applied at the next reconnect rather than
+        # forcing one, which would start a new CLI process and miss the prompt cache.
+        return self._mcp_digest
+
+    # ------------------------------------------------------------------
+    # MCP configuration and workspace digest reloading
+    # ------------------------------------------------------------------
+    async def reload_mcp_config(self) -> bool:
+        """Pick up `.mcp.json` edits, warm-swapping the client if its server set changed.
+
+        Pooled stdio servers are restarted by the pool behind a stable proxy URL, so only
+        edits that change what the client itself connects to trigger a swap.
+        """
+
+        self._mcp_store.refresh()
+        await mcp_pool.sync(self._mcp_store.servers)
+        self._mcp_servers = mcp_pool.client_configs(self._mcp_store.servers)
+        self._mcp_digest = servers_digest(self._mcp_servers)
+        return self._schedule_swap()
+
+    async def refresh_workspace_digest(self) -> bool:
+        """Rescan the workspace if due; returns True when the digest changed.
+
+        A changed digest is used by the next client this session connects (restart or MCP
+        swap); the running client keeps its system prompt.
+        """
+
+        indexer = self._indexer
+        if indexer is None:
+            return False
+        await asyncio.to_thread(indexer.refresh)
+        if indexer is not self._indexer or indexer.digest_hash == self._workspace_digest_hash:
+            return False
+        self._workspace_digest = indexer.digest
+        self._workspace_digest_hash = indexer.digest_hash
+        return True
+
+    async def _wait_for_first_digest(self) -> None:
+        """Index a new workspace in the background, waiting only briefly for the result.
+
+        Small workspaces are scanned within the budget and the first client gets the digest;
+        a large one connects without it and picks it up at the next reconnect.
+        """
+
+        if self._indexer is None or self._indexer.is_indexed:
+            return
+        if self._index_task is None or self._index_task.done():
+            self._index_task = asyncio.create_task(self.refresh_workspace_digest())
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(asyncio.shield(self._index_task), INITIAL_DIGEST_BUDGET)
+
+    def _schedule_swap(self) -> bool:
+        if self._client is None or self._needs_restart:
+            return False
+        key = self._options_key()
+        if self._client_options_key == key:
+            return False
+        if self._swap_task is None or self._swap_task.done():
+            # Back off after failed swaps to these options; a further edit retries at once.
+            if key == self._failed_swap_key and time.monotonic() < self._swap_retry_at:
+                return False
+            self._swap_task = asyncio.create_task(self._warm_swap())
+        return True
+
+    async def _warm_swap(self) -> None:
+        """Connect a replacement client in the background, then swap it in."""
+
+        from claude_code_sdk import ClaudeSDKClient
+
+        key, digest_hash = self._options_key(), self._workspace_digest_hash
+        options = self._build_options()
+        replacement = ClaudeSDKClient(options=options)
+        try:
+            await replacement.connect()
         except Exception as exc:
-            logger.warning("Failed to load MCP config from %s: %s", config_path, exc)
-        return {}
+            with suppress(Exception):
+                await replacement.disconnect()
+            self._swap_failures = self._swap_failures + 1 if key == self._failed_swap_key else 1
+            self._failed_swap_key = key
+            delay = min(SWAP_BACKOFF_INITIAL * 2 ** (self._swap_failures - 1), SWAP_BACKOFF_MAX)
+            self._swap_retry_at = time.monotonic() + delay
+            logger.warning(
+                "Warm client swap failed (%d in a row); retrying in %.0fs: %s",
+                self._swap_failures,
+                delay,
+                exc,
+            )
+            self._log_hook(
+                "client_swap_failed", error=str(exc), failures=self._swap_failures, retry_in=delay
+            )
+            return
+        self._swap_failures = 0
+        self._failed_swap_key = None
+
+        async with self._lock:
+            if self._client is None or self._needs_restart:
+                # A full restart is already pending; the new options will apply there.
+                retired: ClaudeSDKClient = replacement
+            else:
+                retired, self._client = self._client, replacement
+                self._client_options_key = key
+                self._client_conversation = options.resume
+                self._log_hook("client_swap", mcp_digest=key, workspace_digest=digest_hash)
+
+        # Let in-flight streams finish on the client they started with.
+        await self._idle.wait()
+        with suppress(Exception):
+            await retired.disconnect()
 
     # ------------------------------------------------------------------
     async def start(self) -> None:
@@ -161,11 +371,58 @@ class ClaudeSession:
                 await self._client.disconnect()
                 self._client = None
 
-            self._client = ClaudeSDKClient(options=self._options)
-            await self._client.connect()
+            from claude_code_sdk import ClaudeSDKClient
+
+            started = time.perf_counter()
+            options = self._build_options()
+            client = ClaudeSDKClient(options=options)
+            try:
+                await client.connect()
+            except Exception as exc:
+                if options.resume is None or self._workspace_root is None:
+                    raise
+                # The CLI may have pruned the transcript; fall back to a fresh conversation.
+                self._log_hook(
+                    "resume_failed",
+                    session_id=self._conversation,
+                    sdk_session_id=options.resume,
+                    error=str(exc),
+                )
+                with suppress(Exception):
+                    await client.disconnect()
+                resume_store.forget(self._workspace_root, self._conversation or "")
+                options = self._build_options()
+                client = ClaudeSDKClient(options=options)
+                await client.connect()
+            self._client = client
+            self._client_conversation = options.resume
+            self._connect_ms = (time.perf_counter() - started) * 1000
+            self._client_options_key = self._options_key()
             self._needs_restart = False
 
+    async def ping(self) -> float:
+        """Round-trip a no-op control request to the CLI and return the latency in ms."""
+
+        client = self._client
+        if client is None:
+            raise ConnectionError("Claude SDK client not connected")
+        started = time.perf_counter()
+        control = getattr(client, "_query", None)
+        if control is not None and hasattr(control, "set_permission_mode"):
+            # Re-asserting the mode the client already runs in is the cheapest request
+            # the CLI answers, which proves its control loop is responsive.
+            await control.set_permission_mode("default")
+        else:
+            await client.get_server_info()
+        return (time.perf_counter() - started) * 1000
+
     async def shutdown(self) -> None:
+        for task in (self._swap_task, self._index_task):
+            if task is not None:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        self._swap_task = self._index_task = None
         async with self._lock:
             if self._client is not None:
                 await self._client.disconnect()
@@ -181,54 +438,161 @@ class ClaudeSession:
             }
             return
 
-        await self.start()
-        if self._client is None:
-            yield {
-                "type": "error",
-                "message": "Claude SDK session unavailable.",
-            }
+        try:
+            # Fail fast while the circuit is open instead of queueing in the rate limiter.
+            circuit_breaker.check()
+            reservation = await rate_limiter.acquire(DEFAULT_MODEL, prompt)
+        except CircuitOpenError as exc:
+            yield self._circuit_open_event(exc)
+            return
+        except RateLimitExceeded as exc:
+            yield self._rate_limited_event(exc)
             return
 
+        from claude_code_sdk import AssistantMessage, ResultMessage, SystemMessage
+
         queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
         self._event_queue = queue
-
-        async def pump_messages() -> None:
+        self._inflight += 1
+        self._idle.clear()
+        sent = False
+        # Whether the breaker has heard how the sent query ended; a query only counts as a
+        # success once its result arrives, not when the prompt is written to the CLI.
+        settled = False
+
+        def settle(record: Callable[[], None]) -> None:
+            nonlocal settled
+            settled = True
+            record()
+
+        def settle_failure(exc: BaseException) -> None:
+            # Fatal errors (auth, bad request) say nothing about client health.
+            settle(circuit_breaker.record_failure if is_retryable(exc) else circuit_breaker.release)
+
+        async def pump_messages(client: ClaudeSDKClient) -> None:
             try:
-                async for message in self._client.receive_response():
+                async for message in client.receive_response():
                     if isinstance(message, AssistantMessage):
                         await self._handle_assistant_message(message)
                     elif isinstance(message, SystemMessage):
+                        if message.subtype == "init":
+                            self._remember_conversation(session_id, message.data.get("session_id"))
                         await self._emit_event({"type": "system", "data": message.data})
                     elif isinstance(message, ResultMessage):
+                        self._remember_conversation(session_id, message.session_id)
+                        if not message.is_error:
+                            settle(circuit_breaker.record_success)
+                        elif is_rate_limited(message.result):
+                            # Paced by the limiter rather than counted against the breaker.
+                            rate_limiter.record_rate_limited(DEFAULT_MODEL)
+                            settle(circuit_breaker.release)
+                        else:
+                            settle_failure(RuntimeError(message.result or "error result"))
+                        rate_limiter.record_usage(
+                            reservation, message.usage, succeeded=not message.is_error
+                        )
                         await self._emit_event({"type": "result", "data": {}})
                         break
+            except Exception as exc:
+                # The CLI died mid-response: count it against the breaker and reconnect next time.
+                self._needs_restart = True
+                settle_failure(exc)
+                self._log_hook("stream_error", error=str(exc))
+                await self._emit_event(self._stream_error_event(exc))
             finally:
                 await self._emit_event({"type": "complete"})
 
-        self._receiver_task = asyncio.create_task(pump_messages())
-
         try:
-            await self._query_with_retries(prompt, session_id)
+            # A (re)connect made for this query resumes this palette session's conversation.
+            self._conversation = session_id
+            if self._needs_resume():
+                if self._inflight == 1:
+                    self._log_hook("resume_reconnect", session_id=session_id)
+                    self._needs_restart = True
+                else:
+                    # Reconnecting now would cut off the other response on this client.
+                    self._log_hook("resume_skipped", session_id=session_id)
+            await self.reload_mcp_config()
+            await self._wait_for_first_digest()
+            # Admitted only now, so nothing can leave a half-open probe slot held.
+            circuit_breaker.acquire()
+            client = await self._query_with_retries(prompt, session_id, reservation)
+            sent = True
+            self._active_stream = (session_id, client)
+            self._receiver_task = asyncio.create_task(pump_messages(client))
             while True:
                 event = await queue.get()
                 if event.get("type") == "complete":
                     break
                 yield event
-        except Exception as exc:  # pragma: no cover - defensive logging
+        except CircuitOpenError as exc:
+            yield self._circuit_open_event(exc)
+        except RateLimitExceeded as exc:
+            yield self._rate_limited_event(exc)
+        except Exception as exc:
             self._needs_restart = True
             self._log_hook("stream_error", error=str(exc))
-            friendly = "Claude request failed after multiple attempts. Please try again."
-            await self._emit_event({"type": "error", "message": friendly})
+            yield self._stream_error_event(exc)
         finally:
-            if self._receiver_task:
-                self._receiver_task.cancel()
-                with suppress(asyncio.CancelledError):
-                    await self._receiver_task
-                self._receiver_task = None
-            self._event_queue = None
+            try:
+                receiver, self._receiver_task = self._receiver_task, None
+                if receiver is not None:
+                    receiver.cancel()
+                    with suppress(asyncio.CancelledError):
+                        await receiver
+            finally:
+                if sent and not settled:
+                    # Cancelled or abandoned before a result: free a half-open probe slot.
+                    circuit_breaker.release()
+                # Queries that never produced a result give their reservation back.
+                rate_limiter.refund(reservation, sent=sent)
+                self._event_queue = None
+                self._active_stream = None
+                self._inflight -= 1
+                if self._inflight == 0:
+                    self._idle.set()
+
+    @staticmethod
+    def _stream_error_event(exc: BaseException) -> dict[str, Any]:
+        return {
+            "type": "error",
+            "code": "retryable" if is_retryable(exc) else "fatal",
+            "message": "Claude request failed. Please try again.",
+        }
+
+    @staticmethod
+    def _rate_limited_event(exc: RateLimitExceeded) -> dict[str, Any]:
+        return {
+            "type": "error",
+            "code": "rate_limited",
+            "message": "Too many requests right now. Please try again shortly.",
+            "retryAfter": round(exc.retry_after, 1),
+        }
+
+    @staticmethod
+    def _circuit_open_event(exc: CircuitOpenError) -> dict[str, Any]:
+        return {
+            "type": "error",
+            "code": "circuit_open",
+            "message": "Claude is temporarily unavailable. Please try again shortly.",
+            "retryAfter": round(exc.retry_after, 1),
+        }
+
+    async def cancel(self, session_id: str) -> bool:
+        """Interrupt the response currently streaming for `session_id`, if any."""
+
+        active = self._active_stream
+        if active is None or active[0] != session_id:
+            return False
+        self._log_hook("cancel", session_id=session_id)
+        await active[1].interrupt()
+        await self._emit_event({"type": "cancelled"})
+        return True
 
     # ------------------------------------------------------------------
     async def _handle_assistant_message(self, message: AssistantMessage) -> None:
+        from claude_code_sdk import TextBlock, ToolResultBlock, ToolUseBlock
+
         for block in message.content:
             if isinstance(block, TextBlock):
                 await self._emit_event({"type": "assistant_text", "text": block.text})
@@ -248,15 +612,13 @@ class ClaudeSession:
                 display_path = relative_path or canonical_path
                 snippet = None
                 if canonical_path:
-                    try:
-                        snippet = Path(canonical_path).read_text(encoding="utf-8")[-400:]
-                    except Exception:
-                        snippet = None
+                    snippet = await asyncio.to_thread(_read_snippet, Path(canonical_path))
+                content_fields = await tool_results.prepare(block.tool_use_id, block.content)
                 await self._emit_event(
                     {
                         "type": "tool_result",
                         "toolUseId": block.tool_use_id,
-                        "content": self._serialise_tool_result(block.content),
+                        **content_fields,
                         "isError": block.is_error,
                         "path": display_path,
                         "canonicalPath": canonical_path,
@@ -270,8 +632,7 @@ class ClaudeSession:
         await self._event_queue.put(event)
 
     def _log_hook(self, event: str, **context: Any) -> None:
-        payload = {"event": event, **context}
-        logger.info("hook_event %s", json.dumps(payload, ensure_ascii=False))
+        hook_log.log(event, **context)
 
     def _allow_decision(self) -> dict[str, Any]:
         return {
@@ -380,28 +741,56 @@ class ClaudeSession:
             "input": context.input,
         }
 
-    async def _query_with_retries(self, prompt: str, session_id: str) -> None:
+    async def _query_with_retries(
+        self, prompt: str, session_id: str, reservation: Reservation
+    ) -> ClaudeSDKClient:
+        """Connect if needed and send the query, under the shared circuit breaker.
+
+        The caller has already been admitted by the rate limiter and the breaker for the
+        first attempt. Only retryable errors are retried, and only transport failures force a
+        reconnect. Rate-limit errors do not count against the breaker; the retry is paced by
+        the limiter instead of the backoff. A sent query stays admitted: `stream()` reports
+        its outcome to the breaker once the result (or a failure) arrives.
+        """
+
         attempt = 0
-        delay = 0.5
-        last_exc: Exception | None = None
-        while attempt < MAX_QUERY_ATTEMPTS:
+        while True:
             try:
-                if self._client is None:
-                    raise RuntimeError("Claude SDK client unavailable")
-                await self._client.query(prompt, session_id=session_id)
-                return
-            except Exception as exc:  # pragma: no cover - defensive retry path
-                attempt += 1
-                last_exc = exc
-                self._log_hook("query_retry", attempt=attempt, error=str(exc))
-                if attempt >= MAX_QUERY_ATTEMPTS:
-                    break
-                await asyncio.sleep(delay)
-                delay = min(delay * 2, 4.0)
-                self._needs_restart = True
                 await self.start()
-        if last_exc is not None:
-            raise last_exc
+                client = self._client
+                if client is None:
+                    raise ConnectionError("Claude SDK client unavailable")
+                await client.query(prompt, session_id=session_id)
+            except Exception as exc:
+                attempt += 1
+                if is_rate_limited(str(exc)):
+                    circuit_breaker.release()
+                    rate_limiter.record_rate_limited(DEFAULT_MODEL)
+                    self._log_hook("query_rate_limited", attempt=attempt, error=str(exc))
+                    if attempt >= MAX_QUERY_ATTEMPTS:
+                        raise RateLimitExceeded(rate_limiter.retry_after(DEFAULT_MODEL)) from exc
+                    await rate_limiter.reacquire(reservation)
+                    circuit_breaker.acquire()
+                    continue
+                retryable = is_retryable(exc)
+                if retryable:
+                    circuit_breaker.record_failure()
+                else:
+                    circuit_breaker.release()
+                self._log_hook(
+                    "query_retry", attempt=attempt, retryable=retryable, error=str(exc)
+                )
+                if not retryable or attempt >= MAX_QUERY_ATTEMPTS:
+                    raise
+                if needs_reconnect(exc):
+                    self._needs_restart = True
+                await asyncio.sleep(backoff_delay(attempt))
+                circuit_breaker.acquire()
+                continue
+            except BaseException:
+                circuit_breaker.release()
+                raise
+            return client
 
     async def notify_permission_resolution(
         self,
@@ -515,16 +904,116 @@ class ClaudeSession:
             return self._allow_decision()
         return self._deny_decision(reason="User denied")
 
-    @staticmethod
-    def _serialise_tool_result(content: Any) -> str:
-        if content is None:
-            return ""
-        if isinstance(content, str):
-            return content
+
+class WorkspaceSessions:
+    """Routes queries to one `ClaudeSession` per workspace.
+
+    The primary session follows the workspace from settings; queries naming another
+    workspace get a session of their own (client, cwd and allow rules), so different
+    repositories stream side by side. Once more than `capacity` sessions exist, idle ones
+    are shut down least-recently-used first.
+    """
+
+    def __init__(self, primary: ClaudeSession, *, capacity: int = MAX_WORKSPACE_SESSIONS) -> None:
+        self._primary = primary
+        self._capacity = capacity
+        self._sessions: OrderedDict[Path, ClaudeSession] = OrderedDict()
+        self._leases: dict[Path, int] = {}
+        self._api_key: str | None = None
+        self._always_allow: dict[str, list[str]] = {}
+
+    def configure(
+        self, *, api_key: str | None, always_allow: dict[str, list[str]] | None
+    ) -> None:
+        """Apply shared settings to every extra workspace session."""
+
+        self._api_key = api_key
+        self._always_allow = always_allow or {}
+        for workspace_session in self._sessions.values():
+            workspace_session.configure(api_key=api_key, always_allow=self._always_allow)
+
+    def all(self) -> list[ClaudeSession]:
+        return [self._primary, *self._sessions.values()]
+
+    @property
+    def workspaces(self) -> list[str]:
+        return [str(path) for path in self._sessions]
+
+    @asynccontextmanager
+    async def checkout(self, workspace: Path | None) -> AsyncIterator[ClaudeSession]:
+        """Yield the session for `workspace`, protected from eviction until released."""
+
+        if workspace is None or workspace == self._primary.workspace:
+            yield self._primary
+            return
+        workspace_session = self._sessions.get(workspace)
+        if workspace_session is None:
+            workspace_session = ClaudeSession(mcp_store=self._primary._mcp_store)
+            workspace_session.configure(
+                api_key=self._api_key, workspace=workspace, always_allow=self._always_allow
+            )
+            self._sessions[workspace] = workspace_session
+        self._sessions.move_to_end(workspace)
+        self._leases[workspace] = self._leases.get(workspace, 0) + 1
         try:
-            return json.dumps(content, ensure_ascii=False)
-        except TypeError:
-            return str(content)
+            await self._evict()
+            yield workspace_session
+        finally:
+            self._leases[workspace] -= 1
+            if not self._leases[workspace]:
+                del self._leases[workspace]
+            await self._evict()
+
+    def session_for_request(self, request_id: str) -> ClaudeSession | None:
+        for workspace_session in self.all():
+            if workspace_session.has_pending_tool(request_id):
+                return workspace_session
+        return None
+
+    async def cancel(self, session_id: str) -> bool:
+        for workspace_session in self.all():
+            if await workspace_session.cancel(session_id):
+                return True
+        return False
+
+    async def reload_mcp_config(self) -> None:
+        for workspace_session in self.all():
+            await workspace_session.reload_mcp_config()
+
+    async def watch(self, interval: float = MCP_RELOAD_INTERVAL) -> None:
+        """Poll `.mcp.json` and workspace digests; indexers rate-limit their own rescans."""
+
+        while True:
+            await asyncio.sleep(interval)
+            for workspace_session in self.all():
+                try:
+                    await workspace_session.reload_mcp_config()
+                    await workspace_session.refresh_workspace_digest()
+                except Exception as exc:  # pragma: no cover - defensive
+                    logger.warning("Session refresh failed: %s", exc)
+
+    async def shutdown(self) -> None:
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for workspace_session in sessions:
+            await workspace_session.shutdown()
+
+    async def _evict(self) -> None:
+        # The primary session always counts against the cap and is never evicted.
+        excess = len(self._sessions) + 1 - self._capacity
+        evicted: list[tuple[Path, ClaudeSession]] = []
+        for workspace, workspace_session in list(self._sessions.items()):
+            if excess <= 0:
+                break
+            if self._leases.get(workspace) or workspace_session.is_busy:
+                continue
+            del self._sessions[workspace]
+            evicted.append((workspace, workspace_session))
+            excess -= 1
+        for workspace, workspace_session in evicted:
+            hook_log.log("workspace_evicted", workspace=str(workspace))
+            await workspace_session.shutdown()
 
 
 session = ClaudeSession()
+workspace_sessions = WorkspaceSessions(session)
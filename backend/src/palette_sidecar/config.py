@@ -2,13 +2,18 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
 import os
-from dataclasses import asdict, dataclass, field
+from contextlib import suppress
+from dataclasses import asdict, dataclass, field, fields
 from pathlib import Path
 from shutil import which
 from typing import Any
 
+from .persistence import DebouncedWriter, atomic_write
+
 
 def _detect_repo_root(start: Path) -> Path:
     for candidate in start.parents:
@@ -17,30 +22,63 @@ def _detect_repo_root(start: Path) -> Path:
     return start.parents[3]
 
 
+logger = logging.getLogger(__name__)
+
+
 CONFIG_DIR = Path.home() / ".palette-app"
 CONFIG_FILE = CONFIG_DIR / "config.json"
+LOG_DIR = CONFIG_DIR / "logs"
+RUN_DIR = CONFIG_DIR / "run"
 WORKSPACE_MARKER = ".steel-thread-workspace"
 DEMO_FILE_NAME = "steel-thread-demo.txt"
 REPO_ROOT = _detect_repo_root(Path(__file__).resolve())
 BUNDLED_CLI = REPO_ROOT / "assets" / "claude-cli" / "cli.js"
 
 
+# Rate limits are the client-side pacing targets; raise them to match the account's tier.
 MODEL_CATALOG: dict[str, dict[str, Any]] = {
     "claude-sonnet-4-20250514": {
         "label": "Sonnet 4",
         "input_cost_per_million": 3.0,
         "output_cost_per_million": 15.0,
+        "requests_per_minute": 50,
+        "input_tokens_per_minute": 30000,
     },
     "claude-opus-4-1-20250805": {
         "label": "Opus 4.1",
         "input_cost_per_million": 15.0,
         "output_cost_per_million": 75.0,
+        "requests_per_minute": 50,
+        "input_tokens_per_minute": 30000,
     },
 }
 
 DEFAULT_MODEL = "claude-sonnet-4-20250514"
+SETTINGS_SAVE_DEBOUNCE = 0.5
 DEFAULT_WORKSPACE_PATH = Path("/")
 
+# Set PALETTE_MCP_POOL=0 to let each Claude client spawn its own stdio MCP servers again.
+MCP_POOL_ENABLED = os.environ.get("PALETTE_MCP_POOL", "1") != "0"
+# Set PALETTE_DEBUG=1 to expose the /debug profiling endpoints and the loop-lag monitor.
+DEBUG_SURFACE_ENABLED = os.environ.get("PALETTE_DEBUG") == "1"
+# Hook event log level and per-event sampling, e.g. PALETTE_HOOK_LOG_SAMPLE="auto_allow=0.1".
+HOOK_LOG_LEVEL = os.environ.get("PALETTE_HOOK_LOG_LEVEL", "INFO").upper()
+HOOK_LOG_SAMPLE = os.environ.get("PALETTE_HOOK_LOG_SAMPLE")
+# Set PALETTE_COORDINATION=1 when running uvicorn with --workers N so approvals, cancels
+# and session reconnects are routed to the worker that owns them.
+COORDINATION_ENABLED = os.environ.get("PALETTE_COORDINATION") == "1"
+# Each warm workspace client is its own Claude CLI process (a few hundred MB resident), so
+# memory is capped by the number of connected workspace clients, the settings one included.
+MAX_WORKSPACE_SESSIONS = max(int(os.environ.get("PALETTE_MAX_WORKSPACES", "4")), 1)
+# Set PALETTE_WORKSPACE_DIGEST=0 to stop appending the workspace file digest to the prompt.
+WORKSPACE_DIGEST_ENABLED = os.environ.get("PALETTE_WORKSPACE_DIGEST", "1") != "0"
+# How many palette sessions keep a resumable SDK conversation (least recently used dropped).
+MAX_RESUMABLE_SESSIONS = max(int(os.environ.get("PALETTE_RESUMABLE_SESSIONS", "200")), 1)
+# Tool results larger than this many bytes are sent as a preview plus a /tool-result URL.
+TOOL_RESULT_INLINE_BYTES = max(
+    int(os.environ.get("PALETTE_TOOL_RESULT_INLINE_BYTES", "32768")), 1024
+)
+
 
 @dataclass
 class Settings:
@@ -58,20 +96,106 @@ def _serialise(settings: Settings) -> dict[str, Any]:
     return {key: value for key, value in data.items() if value is not None}
 
 
-def load_settings() -> Settings:
-    if CONFIG_FILE.exists():
+def _parse_settings(content: str) -> Settings:
+    payload = json.loads(content)
+    payload.pop("exa", None)
+    return Settings(**payload)
+
+
+class SettingsStore:
+    """Authoritative in-memory settings with debounced, atomic persistence.
+
+    `save()` coalesces bursts of changes (for example several remembered approvals) into
+    one write performed off the event loop. `reload_if_changed()` picks up edits made to
+    the file by something else, detected through its mtime.
+    """
+
+    def __init__(self, path: Path | None = None, *, debounce: float = SETTINGS_SAVE_DEBOUNCE) -> None:
+        self._path = path or CONFIG_FILE
+        self._settings = Settings()
+        self._mtime_ns: int | None = None
+        self._last_written: str | None = None
+        self._writer = DebouncedWriter(
+            self._write_pending, debounce=debounce, description=f"settings to {self._path}"
+        )
+
+    @property
+    def settings(self) -> Settings:
+        """The live settings object. Its identity never changes; reloads update it in place."""
+
+        return self._settings
+
+    def load(self) -> Settings:
+        try:
+            stat = self._path.stat()
+            content = self._path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            self._mtime_ns = None
+            return self._settings
+        except OSError as exc:
+            logger.warning("Failed to read settings from %s: %s", self._path, exc)
+            return self._settings
+        self._mtime_ns = stat.st_mtime_ns
+        try:
+            loaded = _parse_settings(content)
+        except Exception as exc:
+            backup = self._path.with_name(self._path.name + ".corrupt")
+            logger.warning("Settings file %s is invalid (%s); moved it to %s", self._path, exc, backup)
+            with suppress(OSError):
+                os.replace(self._path, backup)
+            self._mtime_ns = None
+            return self._settings
+        self._replace(loaded)
+        self._last_written = content
+        return self._settings
+
+    def reload_if_changed(self) -> bool:
+        """Reload when the file was modified externally. Pending local changes win."""
+
+        if self._writer.pending:
+            return False
         try:
-            payload = json.loads(CONFIG_FILE.read_text(encoding="utf-8"))
-            payload.pop("exa", None)
-            return Settings(**payload)
-        except Exception:
-            return Settings()
-    return Settings()
+            mtime_ns: int | None = self._path.stat().st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns is None or mtime_ns == self._mtime_ns:
+            return False
+        before = _serialise(self._settings)
+        self.load()
+        return _serialise(self._settings) != before
+
+    def save(self) -> None:
+        """Schedule a debounced write of the current settings."""
+
+        self._writer.schedule()
+
+    async def flush(self) -> None:
+        """Write pending changes immediately (used on shutdown)."""
+
+        await self._writer.flush()
+
+    def write_now(self) -> bool:
+        """Synchronously persist the current settings if they differ from the file."""
+
+        self._writer.discard()
+        return self._write(json.dumps(_serialise(self._settings), indent=2))
+
+    async def _write_pending(self) -> None:
+        # Snapshot on the loop; only the disk I/O moves to a worker thread.
+        content = json.dumps(_serialise(self._settings), indent=2)
+        await asyncio.to_thread(self._write, content)
 
+    def _write(self, content: str) -> bool:
+        if content == self._last_written:
+            return False
+        atomic_write(self._path, content)
+        self._last_written = content
+        self._mtime_ns = self._path.stat().st_mtime_ns
+        return True
 
-def save_settings(settings: Settings) -> None:
-    CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-    CONFIG_FILE.write_text(json.dumps(_serialise(settings), indent=2), encoding="utf-8")
+    def _replace(self, loaded: Settings) -> None:
+        for item in fields(Settings):
+            setattr(self._settings, item.name, getattr(loaded, item.name))
 
 
 def ensure_workspace(path_str: str) -> Path:
@@ -149,4 +273,4 @@ def register_always_allow(settings: Settings, *, tool: str, path: Path) -> None:
         rules.append(canonical)
 
 
-ensure_cli_environment()
+settings_store = SettingsStore()
@@ -0,0 +1,304 @@
+"""Cross-process coordination for running the sidecar with several uvicorn workers.
+
+Each worker listens on a Unix domain socket and records what it owns (pending permission
+requests, palette sessions) in a shared SQLite registry. A request that lands on the wrong
+worker is forwarded to the owner over its socket using newline-delimited JSON: one request
+line, then one or more response lines until the owner closes the connection.
+
+Ownership held by a worker whose process has exited is treated as free and taken over, as is
+ownership held by a live worker that no longer answers a ping on its socket (a hung worker).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable
+from contextlib import aclosing, suppress
+from pathlib import Path
+from typing import Any
+
+from .config import RUN_DIR
+
+REGISTRY_FILE = RUN_DIR / "coordination.sqlite3"
+PERMISSION_OWNERSHIP = "permission"
+SESSION_OWNERSHIP = "session"
+RPC_LINE_LIMIT = 16 * 1024 * 1024
+OWNER_PING_TIMEOUT = 2.0
+
+RpcHandler = Callable[[dict[str, Any]], Awaitable[dict[str, Any]] | AsyncIterator[dict[str, Any]]]
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    socket TEXT NOT NULL,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ownership (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    worker_id TEXT NOT NULL,
+    claimed REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+"""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkerRegistry:
+    """SQLite-backed map of live workers and the keys each one owns."""
+
+    def __init__(self, path: Path, worker_id: str, socket_path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._worker_id = worker_id
+        self._socket = str(socket_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def register(self) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                workers = self._conn.execute("SELECT worker_id, pid FROM workers").fetchall()
+                for worker_id, pid in workers:
+                    if not _pid_alive(pid):
+                        self._forget(worker_id)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO workers (worker_id, pid, socket, started) "
+                    "VALUES (?, ?, ?, ?)",
+                    (self._worker_id, os.getpid(), self._socket, time.time()),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def unregister(self) -> None:
+        with self._lock:
+            self._forget(self._worker_id)
+            self._conn.close()
+
+    def live_workers(self) -> int:
+        with self._lock:
+            pids = [pid for (pid,) in self._conn.execute("SELECT pid FROM workers").fetchall()]
+        return max(sum(1 for pid in pids if _pid_alive(pid)), 1)
+
+    def claim(self, kind: str, key: str, *, take_over_from: str | None = None) -> str | None:
+        """Take ownership unless a live worker already holds it; return that worker's socket.
+
+        `take_over_from` names an owner socket known to be unresponsive; its claim is replaced.
+        """
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                owner = self._live_owner(kind, key)
+                if owner is not None and owner == take_over_from:
+                    owner = None
+                if owner is None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO ownership (kind, key, worker_id, claimed) "
+                        "VALUES (?, ?, ?, ?)",
+                        (kind, key, self._worker_id, time.time()),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return owner
+
+    def owner_of(self, kind: str, key: str) -> str | None:
+        """Socket of the live worker (other than this one) owning the key, if any."""
+
+        with self._lock:
+            return self._live_owner(kind, key)
+
+    def release(self, kind: str, key: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM ownership WHERE kind = ? AND key = ? AND worker_id = ?",
+                (kind, key, self._worker_id),
+            )
+
+    def _live_owner(self, kind: str, key: str) -> str | None:
+        row = self._conn.execute(
+            "SELECT o.worker_id, w.pid, w.socket FROM ownership o "
+            "LEFT JOIN workers w ON w.worker_id = o.worker_id WHERE o.kind = ? AND o.key = ?",
+            (kind, key),
+        ).fetchone()
+        if row is None:
+            return None
+        worker_id, pid, socket = row
+        if worker_id == self._worker_id or pid is None or not _pid_alive(pid):
+            return None
+        return str(socket)
+
+    def _forget(self, worker_id: str) -> None:
+        self._conn.execute("DELETE FROM ownership WHERE worker_id = ?", (worker_id,))
+        self._conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+
+class WorkerCoordinator:
+    """Per-worker RPC endpoint plus registry access. Inactive until `start()` is called."""
+
+    def __init__(self, run_dir: Path = RUN_DIR) -> None:
+        self._run_dir = run_dir
+        self._registry: WorkerRegistry | None = None
+        self._server: asyncio.AbstractServer | None = None
+        self._socket_path: Path | None = None
+        self._handlers: dict[str, RpcHandler] = {}
+
+    @property
+    def is_active(self) -> bool:
+        return self._registry is not None
+
+    async def start(self, handlers: dict[str, RpcHandler]) -> None:
+        if self._registry is not None:
+            return
+        self._handlers = dict(handlers)
+        worker_id = f"{os.getpid()}-{int(time.time() * 1000)}"
+        self._run_dir.mkdir(parents=True, exist_ok=True)
+        self._socket_path = self._run_dir / f"worker-{worker_id}.sock"
+        with suppress(FileNotFoundError):
+            self._socket_path.unlink()
+        self._server = await asyncio.start_unix_server(
+            self._handle, path=str(self._socket_path), limit=RPC_LINE_LIMIT
+        )
+        registry = WorkerRegistry(self._run_dir / REGISTRY_FILE.name, worker_id, self._socket_path)
+        await asyncio.to_thread(registry.register)
+        self._registry = registry
+        logger.info("Worker %s coordinating via %s", worker_id, self._socket_path)
+
+    async def stop(self) -> None:
+        registry, self._registry = self._registry, None
+        if registry is not None:
+            await asyncio.to_thread(registry.unregister)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._socket_path is not None:
+            with suppress(FileNotFoundError):
+                self._socket_path.unlink()
+            self._socket_path = None
+
+    # ------------------------------------------------------------------
+    # Ownership
+    # ------------------------------------------------------------------
+    async def claim(self, kind: str, key: str) -> str | None:
+        registry = self._registry
+        if registry is None:
+            return None
+        owner = await asyncio.to_thread(registry.claim, kind, key)
+        if owner is not None and not await self._responsive(owner):
+            logger.warning("Worker at %s is not responding; taking over %s %s", owner, kind, key)
+            owner = await asyncio.to_thread(registry.claim, kind, key, take_over_from=owner)
+        return owner
+
+    async def owner_of(self, kind: str, key: str) -> str | None:
+        if self._registry is None:
+            return None
+        return await asyncio.to_thread(self._registry.owner_of, kind, key)
+
+    async def release(self, kind: str, key: str) -> None:
+        if self._registry is not None:
+            await asyncio.to_thread(self._registry.release, kind, key)
+
+    async def worker_count(self) -> int:
+        """Live workers sharing the registry, this one included (1 when inactive)."""
+
+        if self._registry is None:
+            return 1
+        return await asyncio.to_thread(self._registry.live_workers)
+
+    # ------------------------------------------------------------------
+    # RPC
+    # ------------------------------------------------------------------
+    async def _responsive(self, socket_path: str) -> bool:
+        try:
+            response = await asyncio.wait_for(
+                self.call(socket_path, "ping", {}), OWNER_PING_TIMEOUT
+            )
+        except (OSError, ValueError, asyncio.TimeoutError):
+            return False
+        return response.get("status") == "ok"
+
+    async def call(self, socket_path: str, op: str, payload: dict[str, Any]) -> dict[str, Any]:
+        # Close the connection as soon as the first response arrives.
+        async with aclosing(self.stream(socket_path, op, payload)) as responses:
+            async for response in responses:
+                return response
+        raise ConnectionError(f"Worker at {socket_path} closed without responding")
+
+    async def stream(
+        self, socket_path: str, op: str, payload: dict[str, Any]
+    ) -> AsyncGenerator[dict[str, Any], None]:
+        reader, writer = await asyncio.open_unix_connection(socket_path, limit=RPC_LINE_LIMIT)
+        try:
+            writer.write(json.dumps({"op": op, **payload}).encode("utf-8") + b"\n")
+            await writer.drain()
+            async for line in reader:
+                yield json.loads(line)
+        finally:
+            writer.close()
+            with suppress(Exception):
+                await writer.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = json.loads(await reader.readline())
+            op = request.pop("op", None)
+            if op == "ping":
+                await self._send(writer, {"status": "ok"})
+                return
+            handler = self._handlers.get(op)
+            if handler is None:
+                await self._send(writer, {"error": "unknown operation"})
+                return
+            outcome = handler(request)
+            if inspect.isawaitable(outcome):
+                await self._send(writer, await outcome)
+                return
+            try:
+                async for item in outcome:
+                    await self._send(writer, item)
+            finally:
+                # Stops the local stream promptly when the forwarding worker hangs up.
+                if inspect.isasyncgen(outcome):
+                    await outcome.aclose()
+        except (ConnectionError, ValueError) as exc:
+            logger.debug("Coordination RPC aborted: %s", exc)
+        finally:
+            writer.close()
+            with suppress(Exception):
+                await writer.wait_closed()
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, item: dict[str, Any]) -> None:
+        writer.write(json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n")
+        await writer.drain()
+
+
+coordinator = WorkerCoordinator()
@@ -0,0 +1,249 @@
+"""Opt-in profiling endpoints for diagnosing a sluggish sidecar.
+
+Enabled with ``PALETTE_DEBUG=1``. Provides:
+
+* ``GET /debug/lag`` - event-loop stalls recorded by a background monitor, each with the
+  stack of the callback that was blocking the loop.
+* ``POST /debug/profile?seconds=N`` - a sampled CPU profile of every thread as collapsed
+  stacks (flamegraph input) or a JSON summary of the hottest frames.
+* ``GET /debug/memory`` - tracemalloc top-N allocation diffs since the previous call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from dataclasses import dataclass
+from types import FrameType
+from typing import Any
+
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+
+from .claude_service import workspace_sessions
+from .permissions import broker
+
+LAG_CHECK_INTERVAL = 0.05
+LAG_THRESHOLD = 0.1
+LAG_HISTORY = 50
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_MAX_SECONDS = 60.0
+TRACEMALLOC_FRAMES = 10
+
+
+def _format_frame(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_filename}:{frame.f_lineno} ({code.co_name})"
+
+
+def _stack_lines(frame: FrameType | None, limit: int = 30) -> list[str]:
+    lines: list[str] = []
+    while frame is not None and len(lines) < limit:
+        lines.append(_format_frame(frame))
+        frame = frame.f_back
+    lines.reverse()
+    return lines
+
+
+@dataclass
+class LoopStall:
+    started_at: float
+    duration_ms: float
+    stack: list[str]
+
+
+class LoopLagMonitor:
+    """Detects event-loop stalls and captures what was running while the loop was blocked.
+
+    A heartbeat coroutine ticks every ``interval``; a watchdog thread notices when it has
+    fallen behind and snapshots the loop thread's stack while the offending callback is
+    still executing.
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = LAG_CHECK_INTERVAL,
+        threshold: float = LAG_THRESHOLD,
+        history: int = LAG_HISTORY,
+    ) -> None:
+        self._interval = interval
+        self._threshold = threshold
+        self._stalls: deque[LoopStall] = deque(maxlen=history)
+        self._beat = time.monotonic()
+        self._loop_thread: int | None = None
+        self._captured: list[str] | None = None
+        self._total = 0
+        self._max_ms = 0.0
+        self._stop = threading.Event()
+
+    async def run(self) -> None:
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                self._beat = time.monotonic()
+                await asyncio.sleep(self._interval)
+                lag = time.monotonic() - self._beat - self._interval
+                if lag >= self._threshold:
+                    self._record(lag)
+        finally:
+            self._stop.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self._interval):
+            behind = time.monotonic() - self._beat - self._interval
+            if behind < self._threshold or self._captured is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread or 0)
+            self._captured = _stack_lines(frame)
+
+    def _record(self, lag: float) -> None:
+        stack, self._captured = self._captured or [], None
+        duration_ms = lag * 1000
+        self._total += 1
+        self._max_ms = max(self._max_ms, duration_ms)
+        self._stalls.append(
+            LoopStall(started_at=time.time() - lag, duration_ms=round(duration_ms, 1), stack=stack)
+        )
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "thresholdMs": self._threshold * 1000,
+            "stallCount": self._total,
+            "maxStallMs": round(self._max_ms, 1),
+            "recent": [
+                {"startedAt": stall.started_at, "durationMs": stall.duration_ms, "stack": stall.stack}
+                for stall in reversed(self._stalls)
+            ],
+        }
+
+
+def sample_profile(seconds: float, interval: float = PROFILE_SAMPLE_INTERVAL) -> Counter[str]:
+    """Sample every thread's stack for ``seconds`` and return collapsed-stack counts."""
+
+    own_thread = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    samples: Counter[str] = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            frames: list[str] = []
+            current: FrameType | None = frame
+            while current is not None:
+                code = current.f_code
+                frames.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                current = current.f_back
+            frames.append(names.get(thread_id, str(thread_id)))
+            samples[";".join(reversed(frames))] += 1
+        time.sleep(interval)
+    return samples
+
+
+def _summarise_profile(samples: Counter[str], top: int) -> dict[str, Any]:
+    total = sum(samples.values())
+    self_counts: Counter[str] = Counter()
+    inclusive: Counter[str] = Counter()
+    for stack, count in samples.items():
+        frames = stack.split(";")[1:]
+        if frames:
+            self_counts[frames[-1]] += count
+        for frame in set(frames):
+            inclusive[frame] += count
+
+    def rows(counter: Counter[str]) -> list[dict[str, Any]]:
+        return [
+            {"frame": frame, "samples": count, "percent": round(100 * count / total, 1)}
+            for frame, count in counter.most_common(top)
+        ]
+
+    return {"samples": total, "self": rows(self_counts), "inclusive": rows(inclusive)}
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)]
+    )
+
+
+class MemoryTracker:
+    """Keeps the previous tracemalloc snapshot so each call reports what grew since."""
+
+    def __init__(self) -> None:
+        self._previous: tracemalloc.Snapshot | None = None
+
+    def diff(self, top: int) -> dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._previous = _take_snapshot()
+            return {"tracing": "started", "diff": []}
+
+        snapshot = _take_snapshot()
+        previous, self._previous = self._previous, snapshot
+        current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        stats = snapshot.compare_to(previous, "lineno") if previous is not None else []
+        return {
+            "tracing": "active",
+            "currentBytes": current_bytes,
+            "peakBytes": peak_bytes,
+            "diff": [
+                {
+                    "location": str(stat.traceback[0]),
+                    "sizeBytes": stat.size,
+                    "sizeDiffBytes": stat.size_diff,
+                    "count": stat.count,
+                    "countDiff": stat.count_diff,
+                }
+                for stat in stats[:top]
+            ],
+        }
+
+    def stop(self) -> None:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._previous = None
+
+
+lag_monitor = LoopLagMonitor()
+memory_tracker = MemoryTracker()
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@router.get("/lag")
+async def loop_lag() -> dict[str, Any]:
+    return lag_monitor.snapshot()
+
+
+@router.post("/profile", response_model=None)
+async def profile(
+    seconds: float = Query(5.0, gt=0, le=PROFILE_MAX_SECONDS),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+    top: int = Query(25, gt=0, le=500),
+) -> PlainTextResponse | dict[str, Any]:
+    samples = await asyncio.to_thread(sample_profile, seconds)
+    if format == "json":
+        return _summarise_profile(samples, top)
+    body = "\n".join(f"{stack} {count}" for stack, count in samples.most_common())
+    return PlainTextResponse(body + "\n")
+
+
+@router.get("/memory")
+async def memory(top: int = Query(20, gt=0, le=500)) -> dict[str, Any]:
+    result = memory_tracker.diff(top)
+    result["pendingTools"] = sum(item.pending_tool_count for item in workspace_sessions.all())
+    result["pendingPermissions"] = broker.pending_count
+    return result
+
+
+@router.delete("/memory")
+async def stop_memory_tracking() -> dict[str, str]:
+    memory_tracker.stop()
+    return {"tracing": "stopped"}
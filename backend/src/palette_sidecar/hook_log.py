@@ -0,0 +1,124 @@
+"""Queue-backed NDJSON logging for permission hook events.
+
+Hook events are logged from the request hot path (every permission request, decision,
+retry and auto-allow). Callers only enqueue a record carrying the raw payload; JSON
+encoding and file I/O happen on a `QueueListener` thread writing rotated NDJSON files.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Any
+
+from .config import HOOK_LOG_SAMPLE, LOG_DIR
+
+HOOK_LOG_FILE = LOG_DIR / "hooks.ndjson"
+HOOK_LOG_MAX_BYTES = 5 * 1024 * 1024
+HOOK_LOG_BACKUPS = 3
+
+logger = logging.getLogger("palette_sidecar.hooks")
+# Configuration problems go to the regular sidecar log, not into the hook event file.
+config_logger = logging.getLogger(__name__)
+
+
+def parse_sample_rates(spec: str | None) -> dict[str, float]:
+    """Parse ``"auto_allow=0.1,query_retry=0.5"`` into per-event keep probabilities.
+
+    Malformed entries are skipped with a warning rather than failing startup.
+    """
+
+    rates: dict[str, float] = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        name, _, value = item.partition("=")
+        try:
+            if not name.strip():
+                raise ValueError("missing event name")
+            rates[name.strip()] = min(max(float(value), 0.0), 1.0)
+        except ValueError:
+            config_logger.warning("Ignoring malformed PALETTE_HOOK_LOG_SAMPLE entry %r", item)
+    return rates
+
+
+def parse_level(level: int | str) -> int:
+    """Resolve a level name such as ``"DEBUG"``; unknown names fall back to INFO with a warning."""
+
+    if isinstance(level, int):
+        return level
+    name = level.strip().upper()
+    if name.isdigit():
+        return int(name)
+    resolved = logging.getLevelName(name)
+    if isinstance(resolved, int):
+        return resolved
+    config_logger.warning("Unknown PALETTE_HOOK_LOG_LEVEL %r; using INFO", level)
+    return logging.INFO
+
+
+class NdjsonFormatter(logging.Formatter):
+    """Renders one JSON object per line; runs on the listener thread."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = getattr(record, "hook_payload", None) or {"event": record.getMessage()}
+        entry = {"ts": round(record.created, 3), "level": record.levelname, **payload}
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class HookEventLogger:
+    """Cheap front end for hook events: level check, sampling, then enqueue."""
+
+    def __init__(self, sample_rates: dict[str, float] | None = None) -> None:
+        self._sample_rates = sample_rates or {}
+        self._listener: QueueListener | None = None
+
+    def configure_sampling(self, sample_rates: dict[str, float]) -> None:
+        self._sample_rates = dict(sample_rates)
+
+    def log(self, event: str, level: int = logging.INFO, **context: Any) -> None:
+        if not logger.isEnabledFor(level):
+            return
+        rate = self._sample_rates.get(event, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return
+        # The payload dict rides on the record; encoding is left to the writer thread.
+        logger.log(level, event, extra={"hook_payload": {"event": event, **context}})
+
+    def start(self, path: Path = HOOK_LOG_FILE, *, level: int | str = logging.INFO) -> None:
+        if self._listener is not None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            path,
+            maxBytes=HOOK_LOG_MAX_BYTES,
+            backupCount=HOOK_LOG_BACKUPS,
+            encoding="utf-8",
+            delay=True,
+        )
+        file_handler.setFormatter(NdjsonFormatter())
+        records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        logger.handlers = [QueueHandler(records)]
+        logger.setLevel(parse_level(level))
+        logger.propagate = False
+        self._listener = QueueListener(records, file_handler, respect_handler_level=True)
+        self._listener.start()
+
+    def stop(self) -> None:
+        """Drain queued records to disk and stop the writer thread."""
+
+        listener, self._listener = self._listener, None
+        if listener is None:
+            return
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        logger.handlers = []
+        logger.propagate = True
+
+
+hook_log = HookEventLogger(parse_sample_rates(HOOK_LOG_SAMPLE))
@@ -0,0 +1,546 @@
+"""Supervised pool of long-lived stdio MCP servers shared across client restarts.
+
+Each stdio server declared in `.mcp.json` runs once per sidecar. Claude clients reach it
+through a small SSE proxy on an ephemeral localhost port, so reconnecting a client (or
+running several) reuses the warm process instead of spawning a new one.
+
+The proxy multiplexes client sessions onto the single stdio connection: the pool performs
+the MCP `initialize` handshake itself, answers client handshakes from the cached result and
+rewrites request ids so responses find their way back to the right session.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, TypeGuard
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+from uuid import uuid4
+
+if TYPE_CHECKING:
+    from claude_code_sdk import McpServerConfig
+    from claude_code_sdk.types import McpStdioServerConfig
+
+MCP_PROTOCOL_VERSION = "2024-11-05"
+HEALTH_CHECK_INTERVAL = 15.0
+PING_TIMEOUT = 5.0
+INITIALIZE_TIMEOUT = 30.0
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 30.0
+STABLE_UPTIME = 60.0
+SSE_KEEPALIVE = 15.0
+STDIO_LINE_LIMIT = 16 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def is_stdio_config(config: McpServerConfig) -> TypeGuard[McpStdioServerConfig]:
+    return config.get("type", "stdio") == "stdio"
+
+
+def _error_response(message_id: Any, message: str, code: int = -32000) -> dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": message_id, "error": {"code": code, "message": message}}
+
+
+@dataclass
+class ProxySession:
+    id: str
+    queue: asyncio.Queue[dict[str, Any]] = field(default_factory=asyncio.Queue)
+
+
+class PooledServer:
+    """One supervised stdio MCP server process plus the proxy sessions attached to it."""
+
+    def __init__(self, name: str, config: McpStdioServerConfig) -> None:
+        self.name = name
+        self.config = config
+        self.state = "starting"
+        self.restarts = 0
+        self.last_error: str | None = None
+        self._process: asyncio.subprocess.Process | None = None
+        self._io_tasks: list[asyncio.Task[None]] = []
+        self._supervisor: asyncio.Task[None] | None = None
+        self._sessions: dict[str, ProxySession] = {}
+        self._routes: dict[int, tuple[str, Any]] = {}
+        self._waiters: dict[int, asyncio.Future[dict[str, Any]]] = {}
+        self._ids = itertools.count(1)
+        self._init_result: dict[str, Any] | None = None
+        self._ready = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._replies: set[asyncio.Task[None]] = set()
+
+    # ------------------------------------------------------------------
+    # Supervision
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if self._supervisor is None or self._supervisor.done():
+            self._supervisor = asyncio.create_task(self._supervise())
+
+    async def stop(self) -> None:
+        self.state = "stopped"
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._supervisor
+            self._supervisor = None
+        await self._terminate()
+        self._fail_inflight("MCP server stopped")
+
+    async def reconfigure(self, config: McpStdioServerConfig) -> None:
+        """Restart the child with a new command, args or env, keeping attached sessions.
+
+        Clients keep using the same proxy URL, so their sessions must survive; once the new
+        process is ready they get a `list_changed` notification, as after a crash restart.
+        """
+
+        self.config = config
+        if self._supervisor is None:
+            return
+        self._supervisor.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._supervisor
+        self._supervisor = None
+        self._ready.clear()
+        await self._terminate()
+        self._fail_inflight("MCP server reconfigured")
+        self.restarts += 1
+        logger.info("MCP server %s reconfigured; restarting", self.name)
+        self.start()
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "pid": self._process.pid if self._process else None,
+            "restarts": self.restarts,
+            "sessions": len(self._sessions),
+            "lastError": self.last_error,
+        }
+
+    async def _supervise(self) -> None:
+        loop = asyncio.get_running_loop()
+        delay = BACKOFF_INITIAL
+        while True:
+            started = loop.time()
+            self.state = "starting"
+            try:
+                process = await self._spawn()
+                await self._initialize()
+                self.state = "ready"
+                self._ready.set()
+                if self.restarts:
+                    # Attached clients listed tools against the previous process.
+                    self._broadcast(
+                        {"jsonrpc": "2.0", "method": "notifications/tools/list_changed"}
+                    )
+                logger.info("MCP server %s ready (pid %s)", self.name, process.pid)
+                await self._monitor()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.last_error = str(exc) or type(exc).__name__
+                logger.warning("MCP server %s unhealthy: %s", self.name, self.last_error)
+
+            self._ready.clear()
+            await self._terminate()
+            self._fail_inflight("MCP server restarted")
+            if loop.time() - started >= STABLE_UPTIME:
+                delay = BACKOFF_INITIAL
+            self.state = "backoff"
+            self.restarts += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BACKOFF_MAX)
+
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        config = self.config
+        env = {**os.environ, **config.get("env", {})}
+        process = await asyncio.create_subprocess_exec(
+            config["command"],
+            *config.get("args", []),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+            limit=STDIO_LINE_LIMIT,
+        )
+        self._process = process
+        self._io_tasks = [
+            asyncio.create_task(self._read_stdout(process)),
+            asyncio.create_task(self._drain_stderr(process)),
+        ]
+        return process
+
+    async def _initialize(self) -> None:
+        self._init_result = await self._request(
+            "initialize",
+            {
+                "protocolVersion": MCP_PROTOCOL_VERSION,
+                "capabilities": {},
+                "clientInfo": {"name": "familiar-sidecar", "version": "0.1.0"},
+            },
+            timeout=INITIALIZE_TIMEOUT,
+        )
+        await self._write({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    async def _monitor(self) -> None:
+        assert self._process is not None
+        while True:
+            try:
+                code = await asyncio.wait_for(self._process.wait(), HEALTH_CHECK_INTERVAL)
+            except asyncio.TimeoutError:
+                await self._request("ping", {}, timeout=PING_TIMEOUT)
+                continue
+            raise RuntimeError(f"process exited with code {code}")
+
+    async def _terminate(self) -> None:
+        process, self._process = self._process, None
+        if process is not None and process.returncode is None:
+            with suppress(ProcessLookupError):
+                process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), 5.0)
+            except asyncio.TimeoutError:
+                with suppress(ProcessLookupError):
+                    process.kill()
+                await process.wait()
+        for task in self._io_tasks:
+            task.cancel()
+        self._io_tasks = []
+
+    def _fail_inflight(self, reason: str) -> None:
+        for future in self._waiters.values():
+            if not future.done():
+                future.set_exception(RuntimeError(reason))
+        self._waiters.clear()
+        for session_id, client_id in self._routes.values():
+            self._deliver(session_id, _error_response(client_id, reason))
+        self._routes.clear()
+
+    # ------------------------------------------------------------------
+    # stdio transport
+    # ------------------------------------------------------------------
+    async def _write(self, message: dict[str, Any]) -> None:
+        process = self._process
+        if process is None or process.stdin is None:
+            raise RuntimeError("MCP server not running")
+        data = json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+        async with self._write_lock:
+            process.stdin.write(data)
+            await process.stdin.drain()
+
+    async def _request(
+        self, method: str, params: dict[str, Any], *, timeout: float
+    ) -> dict[str, Any]:
+        request_id = next(self._ids)
+        future: asyncio.Future[dict[str, Any]] = asyncio.get_running_loop().create_future()
+        self._waiters[request_id] = future
+        try:
+            await self._write(
+                {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+            )
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._waiters.pop(request_id, None)
+
+    async def _read_stdout(self, process: asyncio.subprocess.Process) -> None:
+        assert process.stdout is not None
+        async for line in process.stdout:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError:
+                logger.debug("MCP server %s wrote non-JSON output: %r", self.name, line[:200])
+                continue
+            self._dispatch(message)
+        # Hold new requests until the supervisor has a replacement process ready.
+        self._ready.clear()
+        self._fail_inflight("MCP server closed its output")
+
+    async def _drain_stderr(self, process: asyncio.subprocess.Process) -> None:
+        assert process.stderr is not None
+        async for line in process.stderr:
+            logger.debug("mcp[%s] %s", self.name, line.decode("utf-8", "replace").rstrip())
+
+    def _dispatch(self, message: dict[str, Any]) -> None:
+        if "method" in message:
+            if "id" not in message:
+                self._broadcast(message)
+            elif self._sessions:
+                # Server-initiated request: hand it to the longest-attached session.
+                self._deliver(next(iter(self._sessions)), message)
+            else:
+                reply = asyncio.create_task(
+                    self._write(_error_response(message["id"], "No client attached", -32601))
+                )
+                # Keep a reference until it finishes so the task is not garbage collected.
+                self._replies.add(reply)
+                reply.add_done_callback(self._replies.discard)
+            return
+
+        message_id = message.get("id")
+        waiter = self._waiters.get(message_id) if isinstance(message_id, int) else None
+        if waiter is not None:
+            if waiter.done():
+                return
+            if "error" in message:
+                waiter.set_exception(RuntimeError(str(message["error"])))
+            else:
+                waiter.set_result(message.get("result") or {})
+            return
+        route = self._routes.pop(message_id, None) if isinstance(message_id, int) else None
+        if route is not None:
+            session_id, client_id = route
+            self._deliver(session_id, {**message, "id": client_id})
+
+    # ------------------------------------------------------------------
+    # Proxy sessions
+    # ------------------------------------------------------------------
+    def attach(self) -> ProxySession:
+        session = ProxySession(id=uuid4().hex)
+        self._sessions[session.id] = session
+        return session
+
+    def detach(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+        for upstream_id, (owner, _) in list(self._routes.items()):
+            if owner == session_id:
+                self._routes.pop(upstream_id, None)
+
+    def has_session(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def _deliver(self, session_id: str, message: dict[str, Any]) -> None:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.queue.put_nowait(message)
+
+    def _broadcast(self, message: dict[str, Any]) -> None:
+        for session in self._sessions.values():
+            session.queue.put_nowait(message)
+
+    async def handle_client_message(self, session_id: str, message: dict[str, Any]) -> None:
+        method = message.get("method")
+        message_id = message.get("id")
+
+        if method == "notifications/initialized":
+            return
+        if method is not None and message_id is not None:
+            try:
+                await asyncio.wait_for(self._ready.wait(), INITIALIZE_TIMEOUT)
+            except asyncio.TimeoutError:
+                self._deliver(session_id, _error_response(message_id, "MCP server unavailable"))
+                return
+            if method == "initialize":
+                self._deliver(
+                    session_id, {"jsonrpc": "2.0", "id": message_id, "result": self._init_result}
+                )
+                return
+            upstream_id = next(self._ids)
+            self._routes[upstream_id] = (session_id, message_id)
+            message = {**message, "id": upstream_id}
+        elif method == "notifications/cancelled":
+            params = dict(message.get("params") or {})
+            for upstream_id, route in self._routes.items():
+                if route == (session_id, params.get("requestId")):
+                    params["requestId"] = upstream_id
+                    break
+            message = {**message, "params": params}
+
+        try:
+            await self._write(message)
+        except Exception as exc:
+            if method is not None and message_id is not None:
+                self._routes.pop(message["id"], None)
+                self._deliver(session_id, _error_response(message_id, str(exc)))
+
+
+class McpServerPool:
+    """Keeps stdio MCP servers warm and serves them to clients over a local SSE proxy."""
+
+    def __init__(self) -> None:
+        self._servers: dict[str, PooledServer] = {}
+        self._http: asyncio.AbstractServer | None = None
+        self._port: int | None = None
+        self._connections: set[asyncio.Task[Any]] = set()
+
+    @property
+    def is_running(self) -> bool:
+        return self._port is not None
+
+    async def start(self) -> None:
+        if self._http is not None:
+            return
+        self._http = await asyncio.start_server(self._handle_http, host="127.0.0.1", port=0)
+        self._port = self._http.sockets[0].getsockname()[1]
+        logger.info("MCP proxy listening on 127.0.0.1:%s", self._port)
+
+    async def shutdown(self) -> None:
+        servers, self._servers = list(self._servers.values()), {}
+        for server in servers:
+            await server.stop()
+        if self._http is not None:
+            self._http.close()
+            for task in list(self._connections):
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+            await self._http.wait_closed()
+            self._http = None
+        self._port = None
+
+    async def sync(self, servers: dict[str, McpServerConfig]) -> None:
+        """Start, restart or stop pooled processes so they match the given stdio servers."""
+
+        if not self.is_running:
+            return
+        wanted = {name: config for name, config in servers.items() if is_stdio_config(config)}
+        for name in list(self._servers):
+            current = self._servers[name]
+            config = wanted.get(name)
+            if config is None:
+                del self._servers[name]
+                await current.stop()
+            elif config != current.config:
+                # Same name, same proxy URL: restart in place so attached sessions stay valid.
+                await current.reconfigure(config)
+        for name, config in wanted.items():
+            if name not in self._servers:
+                server = PooledServer(name, config)
+                self._servers[name] = server
+                server.start()
+
+    def client_configs(self, servers: dict[str, McpServerConfig]) -> dict[str, McpServerConfig]:
+        """Rewrite stdio entries to point at the proxy; other transports pass through.
+
+        Proxy URLs depend only on the server name, so editing a stdio command restarts the
+        pooled process in place (see `PooledServer.reconfigure`) without changing what
+        clients see.
+        """
+
+        if self._port is None:
+            return dict(servers)
+        from claude_code_sdk.types import McpSSEServerConfig
+
+        return {
+            name: (
+                McpSSEServerConfig(
+                    type="sse", url=f"http://127.0.0.1:{self._port}/mcp/{quote(name, safe='')}/sse"
+                )
+                if is_stdio_config(config)
+                else config
+            )
+            for name, config in servers.items()
+        }
+
+    def status(self) -> dict[str, dict[str, Any]]:
+        return {name: server.status() for name, server in self._servers.items()}
+
+    # ------------------------------------------------------------------
+    # Minimal HTTP/SSE front end (GET /mcp/{name}/sse, POST /mcp/{name}/messages)
+    # ------------------------------------------------------------------
+    async def _handle_http(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        task = asyncio.current_task()
+        if task is not None:
+            self._connections.add(task)
+            task.add_done_callback(self._connections.discard)
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers: dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+
+            url = urlsplit(target)
+            parts = url.path.strip("/").split("/")
+            server = (
+                self._servers.get(unquote(parts[1]))
+                if len(parts) == 3 and parts[0] == "mcp"
+                else None
+            )
+            if server is None:
+                await self._respond(writer, 404, "Not Found")
+            elif method == "GET" and parts[2] == "sse":
+                await self._serve_sse(server, parts[1], reader, writer)
+            elif method == "POST" and parts[2] == "messages":
+                session_id = parse_qs(url.query).get("session_id", [""])[0]
+                if not server.has_session(session_id):
+                    await self._respond(writer, 404, "Unknown session")
+                    return
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    await self._respond(writer, 400, "Invalid JSON")
+                    return
+                await self._respond(writer, 202, "Accepted")
+                for message in payload if isinstance(payload, list) else [payload]:
+                    await server.handle_client_message(session_id, message)
+            else:
+                await self._respond(writer, 405, "Method Not Allowed")
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+            with suppress(Exception):
+                await writer.wait_closed()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, code: int, reason: str) -> None:
+        body = reason.encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {code} {reason}\r\nContent-Type: text/plain\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+            + body
+        )
+        await writer.drain()
+
+    async def _serve_sse(
+        self,
+        server: PooledServer,
+        quoted_name: str,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        session = server.attach()
+        disconnected = asyncio.create_task(reader.read())
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+            )
+            endpoint = f"/mcp/{quoted_name}/messages?session_id={session.id}"
+            writer.write(f"event: endpoint\ndata: {endpoint}\n\n".encode())
+            await writer.drain()
+            while not disconnected.done():
+                getter = asyncio.ensure_future(session.queue.get())
+                _done, _ = await asyncio.wait(
+                    {getter, disconnected},
+                    timeout=SSE_KEEPALIVE,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if getter.done():
+                    data = json.dumps(getter.result(), ensure_ascii=False)
+                    writer.write(f"event: message\ndata: {data}\n\n".encode())
+                else:
+                    getter.cancel()
+                    if disconnected.done():
+                        break
+                    writer.write(b": keepalive\n\n")
+                await writer.drain()
+        finally:
+            disconnected.cancel()
+            server.detach(session.id)
+
+
+mcp_pool = McpServerPool()
@@ -2,13 +2,31 @@
 
 from __future__ import annotations
 
-from typing import Any
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-from claude_code_sdk import McpSSEServerConfig, McpStdioServerConfig
+if TYPE_CHECKING:
+    from claude_code_sdk import McpServerConfig
 
+MCP_CONFIG_FILE = Path(__file__).resolve().parents[3] / ".mcp.json"
 
-def to_mcp_config(manifest: dict[str, Any]) -> McpSSEServerConfig | McpStdioServerConfig:
-    transport = manifest.get("transport")
+_ENV_PATTERN = re.compile(r"\$\{([^}]+)\}")
+
+logger = logging.getLogger(__name__)
+
+
+def to_mcp_config(manifest: dict[str, Any]) -> McpServerConfig:
+    from claude_code_sdk.types import McpHttpServerConfig, McpSSEServerConfig, McpStdioServerConfig
+
+    # `.mcp.json` entries use `type` (or omit it for stdio); registry manifests use `transport`.
+    transport = manifest.get("transport") or manifest.get("type")
+    if transport is None and "command" in manifest:
+        transport = "stdio"
     if transport == "stdio":
         return McpStdioServerConfig(
             command=manifest["command"],
@@ -17,7 +35,129 @@ def to_mcp_config(manifest: dict[str, Any]) -> McpSSEServerConfig | McpStdioServ
         )
     if transport == "sse":
         return McpSSEServerConfig(
+            type="sse",
+            url=manifest["url"],
+            headers=manifest.get("headers", {}),
+        )
+    if transport == "http":
+        return McpHttpServerConfig(
+            type="http",
             url=manifest["url"],
             headers=manifest.get("headers", {}),
         )
     raise ValueError(f"Unsupported transport type: {transport}")
+
+
+def _substitute_env(content: str) -> str:
+    """Replace `${VAR_NAME}` references with environment values (empty when unset)."""
+
+    def replace_env_var(match: re.Match[str]) -> str:
+        var_name = match.group(1)
+        env_value = os.getenv(var_name)
+        if env_value is None:
+            logger.warning(
+                "Environment variable %s not found, skipping MCP server configuration", var_name
+            )
+            return ""
+        return env_value
+
+    return _ENV_PATTERN.sub(replace_env_var, content)
+
+
+def parse_mcp_config(content: str) -> dict[str, McpServerConfig]:
+    """Parse `.mcp.json` content into SDK server configs, raising on malformed input."""
+
+    content = _substitute_env(content)
+    if not content or content.isspace():
+        return {}
+    config = json.loads(content)
+    if not isinstance(config, dict):
+        raise TypeError("MCP config must be a JSON object")
+    manifests = config.get("mcpServers", {})
+    if not isinstance(manifests, dict):
+        raise TypeError("mcpServers must be a JSON object")
+    return {name: to_mcp_config(manifest) for name, manifest in manifests.items()}
+
+
+def servers_digest(servers: dict[str, McpServerConfig]) -> str:
+    """Stable fingerprint of a server set, used to decide whether a client needs a swap."""
+
+    canonical = json.dumps(servers, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class McpConfigStore:
+    """Caches the parsed `.mcp.json`, re-reading it only when its mtime or size changes.
+
+    Malformed updates are rejected and the last good server set stays active.
+    """
+
+    def __init__(self, path: Path = MCP_CONFIG_FILE) -> None:
+        self._path = path
+        self._stamp: tuple[int, int] | None = None
+        self._content_hash: str | None = None
+        self._servers: dict[str, McpServerConfig] = {}
+        self._digest = servers_digest(self._servers)
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def servers(self) -> dict[str, McpServerConfig]:
+        return dict(self._servers)
+
+    @property
+    def digest(self) -> str:
+        return self._digest
+
+    def refresh(self) -> bool:
+        """Reload the file if it changed on disk. Returns True when the server set changed."""
+
+        try:
+            stat = self._path.stat()
+        except FileNotFoundError:
+            if self._stamp is None and self._content_hash is None:
+                return False
+            self._stamp = None
+            self._content_hash = None
+            return self._apply({})
+        except OSError as exc:
+            logger.warning("Failed to stat MCP config %s: %s", self._path, exc)
+            return False
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return False
+
+        try:
+            raw = self._path.read_bytes()
+        except OSError as exc:
+            logger.warning("Failed to read MCP config from %s: %s", self._path, exc)
+            return False
+        self._stamp = stamp
+
+        content_hash = hashlib.sha256(raw).hexdigest()
+        if content_hash == self._content_hash:
+            return False
+        self._content_hash = content_hash
+
+        try:
+            servers = parse_mcp_config(raw.decode("utf-8"))
+        except Exception as exc:
+            logger.warning(
+                "Rejected MCP config update from %s, keeping last good config: %s",
+                self._path,
+                exc,
+            )
+            return False
+        return self._apply(servers)
+
+    def _apply(self, servers: dict[str, McpServerConfig]) -> bool:
+        digest = servers_digest(servers)
+        if digest == self._digest:
+            return False
+        self._servers = servers
+        self._digest = digest
+        logger.info("Loaded MCP config with servers: %s", ", ".join(sorted(servers)) or "none")
+        return True
@@ -8,6 +8,7 @@ from pydantic import BaseModel
 class QueryPayload(BaseModel):
     prompt: str
     session_id: str | None = None
+    workspace: str | None = None
 
 
 class ApprovalPayload(BaseModel):
@@ -19,3 +20,7 @@ class ApprovalPayload(BaseModel):
 class SettingsPayload(BaseModel):
     anthropic_api_key: str | None = None
     workspace: str | None = None
+
+
+class CancelPayload(BaseModel):
+    session_id: str | None = None
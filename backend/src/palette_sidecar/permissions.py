@@ -4,7 +4,12 @@ from __future__ import annotations
 
 import asyncio
 from dataclasses import dataclass
-from typing import Any
+from typing import TYPE_CHECKING, Any
+
+from .coordination import PERMISSION_OWNERSHIP
+
+if TYPE_CHECKING:
+    from .coordination import WorkerCoordinator
 
 
 @dataclass
@@ -19,6 +24,12 @@ class PermissionBroker:
     def __init__(self) -> None:
         self._pending: dict[str, PendingDecision] = {}
         self._lock = asyncio.Lock()
+        self._coordinator: WorkerCoordinator | None = None
+
+    def attach_coordinator(self, coordinator: WorkerCoordinator | None) -> None:
+        """Publish pending request ownership so other workers can forward decisions here."""
+
+        self._coordinator = coordinator
 
     async def register(self, request_id: str, payload: dict[str, Any]) -> asyncio.Future[str]:
         """Register a permission request and return a future resolved on decision."""
@@ -29,7 +40,9 @@ class PermissionBroker:
             loop = asyncio.get_running_loop()
             future: asyncio.Future[str] = loop.create_future()
             self._pending[request_id] = PendingDecision(future=future, payload=payload)
-            return future
+        if self._coordinator is not None:
+            await self._coordinator.claim(PERMISSION_OWNERSHIP, request_id)
+        return future
 
     async def resolve(self, request_id: str, decision: str) -> dict[str, Any]:
         """Resolve a pending permission request and return its payload."""
@@ -39,8 +52,14 @@ class PermissionBroker:
         if pending is None:
             raise KeyError(f"No pending permission for {request_id}")
         pending.future.set_result(decision)
+        if self._coordinator is not None:
+            await self._coordinator.release(PERMISSION_OWNERSHIP, request_id)
         return pending.payload
 
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
     async def get_payload(self, request_id: str) -> dict[str, Any] | None:
         async with self._lock:
             pending = self._pending.get(request_id)
@@ -0,0 +1,102 @@
+"""Atomic file writes and debounced persistence shared by the sidecar's JSON stores."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write(path: Path, content: str) -> None:
+    """Write via temp file, fsync and rename so readers never see a partial file."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(content)
+            handle.flush()
+            os.fsync(handle.fileno())
+        # The stores hold the API key and conversation ids.
+        os.chmod(tmp_name, 0o600)
+        os.replace(tmp_name, path)
+    except BaseException:
+        with suppress(OSError):
+            os.unlink(tmp_name)
+        raise
+    with suppress(OSError):
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class DebouncedWriter:
+    """Coalesces bursts of `schedule()` calls into one `write()` per debounce interval.
+
+    `write` snapshots the store on the event loop and does its disk I/O in a worker thread;
+    raising `OSError` leaves the changes pending. Changes scheduled while a write is in
+    flight are written by a further pass, so none are lost.
+    """
+
+    def __init__(
+        self, write: Callable[[], Awaitable[None]], *, debounce: float, description: str
+    ) -> None:
+        self._write = write
+        self._debounce = debounce
+        self._description = description
+        self._dirty = False
+        self._task: asyncio.Task[None] | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> bool:
+        return self._dirty
+
+    def schedule(self) -> None:
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._write_later())
+
+    def discard(self) -> None:
+        """Forget pending changes, e.g. because the caller just wrote them synchronously."""
+
+        self._dirty = False
+
+    async def flush(self) -> None:
+        """Write pending changes immediately (used on shutdown)."""
+
+        await self._write_pending()
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    async def _write_later(self) -> None:
+        while True:
+            await asyncio.sleep(self._debounce)
+            if not await self._write_pending() or not self._dirty:
+                return
+
+    async def _write_pending(self) -> bool:
+        """Write if dirty; returns False when the write failed and changes remain pending."""
+
+        async with self._lock:
+            if not self._dirty:
+                return True
+            self._dirty = False
+            try:
+                await self._write()
+            except OSError as exc:
+                self._dirty = True
+                logger.warning("Failed to save %s: %s", self._description, exc)
+                return False
+            return True
@@ -0,0 +1,145 @@
+"""Background health probes behind the liveness and readiness endpoints.
+
+Prerequisite checks (a PATH scan for ``node`` and a stat of the bundled CLI) and client
+pings run on an interval; the endpoints only read the cached results, so they are cheap
+enough to poll at high frequency.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from .circuit import OPEN, circuit_breaker
+from .claude_service import ClaudeSession, workspace_sessions
+from .config import detect_prerequisites
+from .mcp_pool import mcp_pool
+
+PROBE_INTERVAL = 10.0
+PING_TIMEOUT = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ClientProbe:
+    workspace: str | None
+    connected: bool
+    busy: bool
+    connect_ms: float | None
+    ping_ms: float | None
+    error: str | None
+
+    def payload(self) -> dict[str, Any]:
+        return {
+            "workspace": self.workspace,
+            "connected": self.connected,
+            "busy": self.busy,
+            "connectMs": _round(self.connect_ms),
+            "pingMs": _round(self.ping_ms),
+            "error": self.error,
+        }
+
+
+def _round(value: float | None) -> float | None:
+    return round(value, 1) if value is not None else None
+
+
+class HealthProber:
+    """Periodically checks prerequisites and Claude clients, caching the results."""
+
+    def __init__(
+        self, *, interval: float = PROBE_INTERVAL, ping_timeout: float = PING_TIMEOUT
+    ) -> None:
+        self._interval = interval
+        self._ping_timeout = ping_timeout
+        self._started = time.time()
+        self._prerequisites: dict[str, bool] | None = None
+        self._clients: list[ClientProbe] = []
+        self._checked_at: float | None = None
+        self._wake: asyncio.Event | None = None
+
+    @property
+    def prerequisites(self) -> dict[str, bool]:
+        if self._prerequisites is None:
+            # Only hit before the first probe completes.
+            self._prerequisites = detect_prerequisites()
+        return self._prerequisites
+
+    def invalidate(self) -> None:
+        """Probe again now instead of waiting for the next interval (e.g. after settings change)."""
+
+        if self._wake is not None:
+            self._wake.set()
+
+    async def run(self) -> None:
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await self.refresh()
+            except Exception as exc:  # pragma: no cover - defensive
+                logger.warning("Health probe failed: %s", exc)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self._interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def refresh(self) -> None:
+        self._prerequisites = await asyncio.to_thread(detect_prerequisites)
+        self._clients = [await self._probe(item) for item in workspace_sessions.all()]
+        self._checked_at = time.time()
+
+    async def _probe(self, session: ClaudeSession) -> ClientProbe:
+        workspace = str(session.workspace) if session.workspace else None
+        probe = ClientProbe(
+            workspace=workspace,
+            connected=session.is_connected,
+            busy=session.is_busy,
+            connect_ms=session.connect_latency_ms,
+            ping_ms=None,
+            error=None,
+        )
+        if not probe.connected:
+            return probe
+        try:
+            probe.ping_ms = await asyncio.wait_for(session.ping(), self._ping_timeout)
+        except asyncio.TimeoutError:
+            probe.error = f"ping timed out after {self._ping_timeout:g}s"
+        except Exception as exc:
+            probe.error = str(exc) or type(exc).__name__
+        return probe
+
+    def liveness(self) -> dict[str, Any]:
+        return {"status": "ok", "uptime": round(time.time() - self._started, 1)}
+
+    def readiness(self) -> tuple[bool, dict[str, Any]]:
+        """Ready once prerequisites are present and the primary client answered its last ping."""
+
+        missing = [name for name, ok in self.prerequisites.items() if not ok]
+        primary = self._clients[0] if self._clients else None
+        reasons: list[str] = [f"missing {name}" for name in missing]
+        if self._checked_at is None:
+            reasons.append("starting")
+        elif primary is None or not primary.connected:
+            reasons.append("client not connected")
+        elif primary.error:
+            reasons.append(f"client unresponsive: {primary.error}")
+        if circuit_breaker.state == OPEN:
+            reasons.append("circuit open")
+        ready = not reasons
+        return ready, {
+            "status": "ready" if ready else "not_ready",
+            "reasons": reasons,
+            "checkedAt": self._checked_at,
+            "prerequisites": self.prerequisites,
+            "clients": [probe.payload() for probe in self._clients],
+            "mcpServers": mcp_pool.status(),
+            "circuit": circuit_breaker.snapshot(),
+        }
+
+
+prober = HealthProber()
@@ -0,0 +1,266 @@
+"""Client-side pacing of Claude queries against upstream rate limits.
+
+Each model gets two token buckets, requests/minute and input tokens/minute, sized from
+`MODEL_CATALOG`. A query reserves one request and an estimate of its input tokens (learned
+from the usage reported in `ResultMessage`). It waits in FIFO order for the buckets to
+refill, giving up with a `retryAfter` hint only if the wait would exceed `max_wait`. The
+reservation is reconciled with actual usage afterwards. An upstream rate-limit error halves
+the model's effective limits and empties its buckets; the limits then recover a step with
+every successful query. With several workers, each paces at its share of the catalog limits.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from .config import MODEL_CATALOG
+from .hook_log import hook_log
+
+RATE_LIMIT_MAX_WAIT = 20.0
+RATE_LIMIT_BACKOFF = 5.0
+MIN_LIMIT_SCALE = 0.1
+LIMIT_RECOVERY_STEP = 0.05
+DEFAULT_QUERY_TOKENS = 2000
+USAGE_SMOOTHING = 0.2
+CHARS_PER_TOKEN = 4
+
+_RATE_LIMIT_MARKERS = ("429", "rate_limit", "rate limit")
+
+logger = logging.getLogger(__name__)
+
+
+def is_rate_limited(message: str | None) -> bool:
+    text = (message or "").lower()
+    return any(marker in text for marker in _RATE_LIMIT_MARKERS)
+
+
+class RateLimitExceeded(RuntimeError):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Rate limit reached; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Continuously refilling bucket; `level` may go negative when usage is reconciled."""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float]) -> None:
+        self._clock = clock
+        self.per_minute = per_minute
+        self.level = per_minute
+        self._updated = clock()
+
+    @property
+    def capacity(self) -> float:
+        return self.per_minute
+
+    def refill(self) -> None:
+        now = self._clock()
+        elapsed, self._updated = now - self._updated, now
+        self.level = min(self.capacity, self.level + elapsed * self.per_minute / 60)
+
+    def wait_time(self, amount: float) -> float:
+        self.refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0.0) * 60 / self.per_minute
+
+    def take(self, amount: float) -> None:
+        self.refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+@dataclass
+class Reservation:
+    model: str
+    tokens: int
+    settled: bool = False
+
+
+class ModelLimits:
+    def __init__(
+        self, requests_per_minute: float, tokens_per_minute: float, clock: Callable[[], float]
+    ) -> None:
+        self._clock = clock
+        self.base_requests = requests_per_minute
+        self.base_tokens = tokens_per_minute
+        self.requests = TokenBucket(requests_per_minute, clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock)
+        self.scale = 1.0
+        self.share = 1.0
+        self.blocked_until = 0.0
+        self.estimate = float(DEFAULT_QUERY_TOKENS)
+        self.lock = asyncio.Lock()
+        self.queued = 0
+        self.rate_limited = 0
+
+    def rescale(self, scale: float) -> None:
+        self.scale = min(max(scale, MIN_LIMIT_SCALE), 1.0)
+        for bucket, base in ((self.requests, self.base_requests), (self.tokens, self.base_tokens)):
+            bucket.refill()
+            bucket.per_minute = base * self.scale * self.share
+            bucket.level = min(bucket.level, bucket.capacity)
+
+    def wait_time(self, tokens: int) -> float:
+        hold = max(self.blocked_until - self._clock(), 0.0)
+        return max(hold, self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        catalog: dict[str, dict[str, Any]] = MODEL_CATALOG,
+        *,
+        max_wait: float = RATE_LIMIT_MAX_WAIT,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self._catalog = catalog
+        self._max_wait = max_wait
+        self._clock = clock
+        self._sleep = sleep
+        self._share = 1.0
+        self._models: dict[str, ModelLimits] = {}
+
+    def _limits(self, model: str) -> ModelLimits | None:
+        limits = self._models.get(model)
+        if limits is None:
+            entry = self._catalog.get(model, {})
+            rpm, tpm = entry.get("requests_per_minute"), entry.get("input_tokens_per_minute")
+            if not rpm or not tpm:
+                return None
+            limits = self._models[model] = ModelLimits(rpm, tpm, self._clock)
+            if self._share != 1.0:
+                limits.share = self._share
+                limits.rescale(limits.scale)
+        return limits
+
+    def set_workers(self, count: int) -> None:
+        """Pace at 1/`count` of the catalog limits, which are per account, not per worker."""
+
+        share = 1.0 / max(count, 1)
+        if share == self._share:
+            return
+        self._share = share
+        for limits in self._models.values():
+            limits.share = share
+            limits.rescale(limits.scale)
+        logger.info("Pacing at 1/%d of catalog rate limits across workers", max(count, 1))
+
+    async def acquire(self, model: str, prompt: str) -> Reservation:
+        """Wait for capacity for one query; raises `RateLimitExceeded` rather than wait too long."""
+
+        limits = self._limits(model)
+        if limits is None:
+            return Reservation(model, 0, settled=True)
+        tokens = int(max(limits.estimate, len(prompt) / CHARS_PER_TOKEN))
+        tokens = min(tokens, int(limits.tokens.capacity))
+        await self._wait_and_take(limits, tokens)
+        return Reservation(model, tokens)
+
+    async def reacquire(self, reservation: Reservation) -> None:
+        """Queue again before retrying a query the API rejected with a rate-limit error."""
+
+        limits = self._limits(reservation.model)
+        if limits is None or reservation.settled:
+            return
+        # The rejected attempt consumed nothing upstream; its estimate is taken again below.
+        limits.tokens.take(-reservation.tokens)
+        await self._wait_and_take(limits, reservation.tokens)
+
+    async def _wait_and_take(self, limits: ModelLimits, tokens: int) -> None:
+        deadline = self._clock() + self._max_wait
+        limits.queued += 1
+        try:
+            async with limits.lock:
+                while True:
+                    wait = limits.wait_time(tokens)
+                    if wait <= 0:
+                        break
+                    if self._clock() + wait > deadline:
+                        raise RateLimitExceeded(wait)
+                    await self._sleep(wait)
+                limits.requests.take(1)
+                limits.tokens.take(tokens)
+        finally:
+            limits.queued -= 1
+
+    def retry_after(self, model: str) -> float:
+        limits = self._limits(model)
+        if limits is None:
+            return 0.0
+        return limits.wait_time(int(limits.estimate))
+
+    def refund(self, reservation: Reservation, *, sent: bool = False) -> None:
+        """Give back a reservation that produced no usage report.
+
+        The token estimate is always returned. The request slot is returned only for queries
+        that were never sent, since the API counts every request it received.
+        """
+
+        if reservation.settled:
+            return
+        reservation.settled = True
+        limits = self._limits(reservation.model)
+        if limits is not None:
+            limits.tokens.take(-reservation.tokens)
+            if not sent:
+                limits.requests.take(-1)
+
+    def record_usage(
+        self, reservation: Reservation, usage: dict[str, Any] | None, *, succeeded: bool = True
+    ) -> None:
+        """Reconcile a reservation with reported usage; only successes recover the pace."""
+
+        if reservation.settled:
+            return
+        reservation.settled = True
+        limits = self._limits(reservation.model)
+        if limits is None:
+            return
+        if succeeded and limits.scale < 1.0:
+            limits.rescale(limits.scale + LIMIT_RECOVERY_STEP)
+        if not usage:
+            return
+        # Cache reads do not count towards the input-token limit; cache writes do.
+        actual = int(usage.get("input_tokens") or 0) + int(
+            usage.get("cache_creation_input_tokens") or 0
+        )
+        limits.tokens.take(actual - reservation.tokens)
+        limits.estimate += USAGE_SMOOTHING * (actual - limits.estimate)
+
+    def record_rate_limited(self, model: str, retry_after: float | None = None) -> None:
+        limits = self._limits(model)
+        if limits is None:
+            return
+        limits.rate_limited += 1
+        limits.rescale(limits.scale / 2)
+        limits.requests.level = min(limits.requests.level, 0.0)
+        limits.tokens.level = min(limits.tokens.level, 0.0)
+        limits.blocked_until = self._clock() + (retry_after or RATE_LIMIT_BACKOFF)
+        hook_log.log("rate_limited", model=model, scale=round(limits.scale, 2))
+        logger.info("Rate limited on %s; pacing at %.0f%% of catalog limits", model, limits.scale * 100)
+
+    def snapshot(self) -> dict[str, Any]:
+        models: dict[str, Any] = {}
+        for model, limits in self._models.items():
+            limits.requests.refill()
+            limits.tokens.refill()
+            models[model] = {
+                "scale": round(limits.scale, 2),
+                "requestsPerMinute": round(limits.requests.per_minute, 1),
+                "requestsAvailable": round(limits.requests.level, 1),
+                "tokensPerMinute": round(limits.tokens.per_minute),
+                "tokensAvailable": round(limits.tokens.level),
+                "estimatedTokensPerQuery": round(limits.estimate),
+                "queued": limits.queued,
+                "rateLimited": limits.rate_limited,
+                "blockedFor": round(max(limits.blocked_until - self._clock(), 0.0), 1),
+            }
+        return models
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,165 @@
+"""Persisted mapping from palette sessions to Claude SDK session IDs.
+
+The CLI keeps each conversation's transcript under an SDK session ID. Recording the ID a
+palette session last used lets a reconnecting client pass it as ``resume`` and carry on the
+conversation instead of starting over. Entries are keyed by workspace too, because the CLI
+stores transcripts per working directory. Only the most recently used entries are kept.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .config import CONFIG_DIR, MAX_RESUMABLE_SESSIONS
+from .persistence import DebouncedWriter, atomic_write
+
+RESUME_FILE = CONFIG_DIR / "sessions.json"
+RESUME_SAVE_DEBOUNCE = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResumeEntry:
+    workspace: str
+    session_id: str
+    sdk_session_id: str
+    updated: float
+
+
+def _key(workspace: str, session_id: str) -> tuple[str, str]:
+    return workspace, session_id
+
+
+class ResumeStore:
+    """LRU of resumable conversations with debounced, atomic persistence."""
+
+    def __init__(
+        self,
+        path: Path = RESUME_FILE,
+        *,
+        capacity: int = MAX_RESUMABLE_SESSIONS,
+        debounce: float = RESUME_SAVE_DEBOUNCE,
+    ) -> None:
+        self._path = path
+        self._capacity = capacity
+        self._entries: OrderedDict[tuple[str, str], ResumeEntry] = OrderedDict()
+        self._forgotten: set[tuple[str, str]] = set()
+        self._mtime_ns: int | None = None
+        self._writer = DebouncedWriter(
+            self._write_pending, debounce=debounce, description=f"resumable sessions to {path}"
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self) -> None:
+        self._mtime_ns = self._file_mtime()
+        self._entries = OrderedDict(
+            (_key(entry.workspace, entry.session_id), entry) for entry in self._read()
+        )
+        self._trim()
+
+    def reload_if_changed(self) -> bool:
+        """Merge entries another worker saved since this store last read or wrote the file."""
+
+        mtime_ns = self._file_mtime()
+        if mtime_ns is None or mtime_ns == self._mtime_ns:
+            return False
+        self._mtime_ns = mtime_ns
+        changed = False
+        for entry in self._read():
+            key = _key(entry.workspace, entry.session_id)
+            current = self._entries.get(key)
+            if key not in self._forgotten and (current is None or current.updated < entry.updated):
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                changed = True
+        self._trim()
+        return changed
+
+    def lookup(self, workspace: Path, session_id: str) -> str | None:
+        key = _key(str(workspace), session_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry.sdk_session_id
+
+    def record(self, workspace: Path, session_id: str, sdk_session_id: str) -> None:
+        key = _key(str(workspace), session_id)
+        entry = self._entries.get(key)
+        if entry is not None and entry.sdk_session_id == sdk_session_id:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = ResumeEntry(str(workspace), session_id, sdk_session_id, time.time())
+        self._entries.move_to_end(key)
+        self._forgotten.discard(key)
+        self._trim()
+        self.save()
+
+    def forget(self, workspace: Path, session_id: str) -> None:
+        key = _key(str(workspace), session_id)
+        if self._entries.pop(key, None) is not None:
+            self._forgotten.add(key)
+            self.save()
+
+    def save(self) -> None:
+        self._writer.schedule()
+
+    async def flush(self) -> None:
+        await self._writer.flush()
+
+    async def _write_pending(self) -> None:
+        entries = list(self._entries.values())
+        forgotten, self._forgotten = self._forgotten, set()
+        try:
+            await asyncio.to_thread(self._write, entries, forgotten)
+        except OSError:
+            # Kept for the retry; entries recorded since still win over these in `_write`.
+            self._forgotten |= forgotten
+            raise
+
+    def _write(self, entries: list[ResumeEntry], forgotten: set[tuple[str, str]]) -> None:
+        # Other workers share the file; keep their newer entries rather than clobbering them.
+        merged = {_key(entry.workspace, entry.session_id): entry for entry in self._read()}
+        for key in forgotten:
+            merged.pop(key, None)
+        for entry in entries:
+            key = _key(entry.workspace, entry.session_id)
+            current = merged.get(key)
+            if current is None or current.updated <= entry.updated:
+                merged[key] = entry
+        newest = sorted(merged.values(), key=lambda entry: entry.updated)[-self._capacity :]
+        atomic_write(self._path, json.dumps([asdict(entry) for entry in newest], indent=2))
+        self._mtime_ns = self._file_mtime()
+
+    def _file_mtime(self) -> int | None:
+        try:
+            return self._path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self) -> list[ResumeEntry]:
+        try:
+            raw = json.loads(self._path.read_text(encoding="utf-8"))
+            entries = [ResumeEntry(**item) for item in raw]
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError, TypeError) as exc:
+            logger.warning("Ignoring unreadable resumable sessions file %s: %s", self._path, exc)
+            return []
+        return sorted(entries, key=lambda entry: entry.updated)
+
+    def _trim(self) -> None:
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+
+
+resume_store = ResumeStore()
@@ -0,0 +1,191 @@
+"""Bounded handling of tool results too large to push through one SSE event.
+
+Results up to `TOOL_RESULT_INLINE_BYTES` are sent inline. Larger ones are sent as a preview
+of that size, with the full text spilled to a file under ``RUN_DIR/tool-results`` and served
+by ``GET /tool-result/{toolUseId}`` (byte ranges supported). The directory is shared, so
+any worker can serve a result another worker spilled. Spilled files are pruned by age and
+by total size. Encoding large results and writing them out happens in a worker thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections.abc import Iterator
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from .config import RUN_DIR, TOOL_RESULT_INLINE_BYTES
+
+TOOL_RESULT_DIR = RUN_DIR / "tool-results"
+TOOL_RESULT_TTL = 3600.0
+TOOL_RESULT_STORE_BYTES = 256 * 1024 * 1024
+SERIALISE_IN_THREAD_BYTES = 64 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+
+_TOOL_USE_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_size(value: Any, limit: int) -> int:
+    """Rough encoded size of a JSON-like value, giving up once it exceeds `limit`."""
+
+    total = 0
+    stack = [value]
+    while stack and total <= limit:
+        item = stack.pop()
+        if isinstance(item, str):
+            total += len(item) + 2
+        elif isinstance(item, dict):
+            total += 2
+            for key, child in item.items():
+                total += len(str(key)) + 4
+                stack.append(child)
+        elif isinstance(item, (list, tuple)):
+            total += 2
+            stack.extend(item)
+        else:
+            total += 8
+    return total
+
+
+def serialise(content: Any) -> str:
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    try:
+        return json.dumps(content, ensure_ascii=False)
+    except TypeError:
+        return str(content)
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a single ``bytes=`` range into an inclusive (start, end) pair.
+
+    Returns None when the header is absent; raises ValueError when it cannot be satisfied.
+    """
+
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if match is None or match.group(1) == match.group(2) == "":
+        raise ValueError(header)
+    first, last = match.groups()
+    if first == "":
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def iter_file(handle: BinaryIO, start: int, end: int) -> Iterator[bytes]:
+    """Yield bytes ``start..end`` inclusive, then close ``handle``.
+
+    Synchronous so Starlette runs it in a thread. Taking an already-open handle keeps the
+    bytes readable even if the store prunes the file mid-response.
+    """
+
+    remaining = end - start + 1
+    with handle:
+        handle.seek(start)
+        while remaining > 0:
+            chunk = handle.read(min(READ_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class ToolResultStore:
+    def __init__(
+        self,
+        directory: Path = TOOL_RESULT_DIR,
+        *,
+        inline_limit: int = TOOL_RESULT_INLINE_BYTES,
+        max_bytes: int = TOOL_RESULT_STORE_BYTES,
+        ttl: float = TOOL_RESULT_TTL,
+    ) -> None:
+        self._directory = directory
+        self._inline_limit = inline_limit
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+
+    async def prepare(self, tool_use_id: str, content: Any) -> dict[str, Any]:
+        """Event fields for a tool result: the content inline, or a preview plus a URL."""
+
+        if not isinstance(content, str) and content is not None:
+            if estimate_size(content, SERIALISE_IN_THREAD_BYTES) > SERIALISE_IN_THREAD_BYTES:
+                content = await asyncio.to_thread(serialise, content)
+            else:
+                content = serialise(content)
+        text = content or ""
+        # Cheap check first: UTF-8 needs at most four bytes per character.
+        if len(text) * 4 <= self._inline_limit:
+            return {"content": text}
+        return await asyncio.to_thread(self._bound, tool_use_id, text)
+
+    def path_for(self, tool_use_id: str) -> Path | None:
+        if not _TOOL_USE_ID.match(tool_use_id):
+            return None
+        path = self._directory / f"{tool_use_id}.txt"
+        return path if path.is_file() else None
+
+    def _bound(self, tool_use_id: str, text: str) -> dict[str, Any]:
+        encoded = text.encode("utf-8")
+        if len(encoded) <= self._inline_limit:
+            return {"content": text}
+        preview = encoded[: self._inline_limit].decode("utf-8", errors="ignore")
+        fields: dict[str, Any] = {
+            "content": preview,
+            "contentTruncated": True,
+            "contentSize": len(encoded),
+            "contentUrl": None,
+        }
+        if not _TOOL_USE_ID.match(tool_use_id):
+            return fields
+        try:
+            self._spill(tool_use_id, encoded)
+        except OSError as exc:
+            logger.warning("Failed to store tool result %s: %s", tool_use_id, exc)
+            return fields
+        fields["contentUrl"] = f"/tool-result/{tool_use_id}"
+        return fields
+
+    def _spill(self, tool_use_id: str, encoded: bytes) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        target = self._directory / f"{tool_use_id}.txt"
+        temporary = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        temporary.write_bytes(encoded)
+        os.chmod(temporary, 0o600)
+        os.replace(temporary, target)
+        self._prune(keep=target)
+
+    def _prune(self, keep: Path) -> None:
+        entries: list[tuple[float, int, Path]] = []
+        for path in self._directory.glob("*.txt"):
+            with suppress(OSError):
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self._ttl
+        for mtime, size, path in entries:
+            if path == keep or (mtime >= cutoff and total <= self._max_bytes):
+                continue
+            with suppress(OSError):
+                path.unlink()
+                total -= size
+
+
+tool_results = ToolResultStore()
@@ -0,0 +1,325 @@
+"""Compact, incrementally maintained digest of a workspace for the system prompt.
+
+The digest lists the workspace's files (gitignore respected), language counts and the
+top-level symbols of source files. Everything is rendered in sorted order so an unchanged
+workspace produces byte-identical text and the upstream prompt cache keeps hitting. Sizes
+are left out on purpose: ordinary edits should not change the prompt, only adding, removing
+or renaming files and symbols does. Rescans only re-read files whose mtime or size changed.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+INDEX_REFRESH_INTERVAL = 30.0
+MAX_INDEXED_FILES = 2000
+MAX_DIGEST_BYTES = 24 * 1024
+MAX_SYMBOL_SOURCE_BYTES = 256 * 1024
+MAX_SYMBOLS_PER_FILE = 8
+GIT_LIST_TIMEOUT = 10.0
+
+SKIPPED_DIRS = frozenset(
+    {
+        ".git",
+        ".build",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".ruff_cache",
+        ".venv",
+        "DerivedData",
+        "__pycache__",
+        "build",
+        "dist",
+        "node_modules",
+        "venv",
+    }
+)
+
+LANGUAGES = {
+    ".c": "C",
+    ".cpp": "C++",
+    ".css": "CSS",
+    ".go": "Go",
+    ".h": "C",
+    ".html": "HTML",
+    ".java": "Java",
+    ".js": "JavaScript",
+    ".json": "JSON",
+    ".jsx": "JavaScript",
+    ".kt": "Kotlin",
+    ".m": "Objective-C",
+    ".md": "Markdown",
+    ".py": "Python",
+    ".rb": "Ruby",
+    ".rs": "Rust",
+    ".sh": "Shell",
+    ".sql": "SQL",
+    ".swift": "Swift",
+    ".toml": "TOML",
+    ".ts": "TypeScript",
+    ".tsx": "TypeScript",
+    ".yaml": "YAML",
+    ".yml": "YAML",
+}
+
+_JS_SYMBOLS = re.compile(
+    r"^(?:export\s+)?(?:default\s+)?(?:async\s+)?"
+    r"(?:function\*?|class|interface|type|enum|const|let)\s+([A-Za-z_$][\w$]*)",
+    re.MULTILINE,
+)
+_SYMBOL_PATTERNS: dict[str, re.Pattern[str]] = {
+    "Python": re.compile(r"^(?:async\s+def|def|class)\s+([A-Za-z_]\w*)", re.MULTILINE),
+    "Swift": re.compile(
+        r"^(?:(?:public|open|internal|private|fileprivate|final)\s+)*"
+        r"(?:class|struct|enum|protocol|actor|extension|func)\s+([A-Za-z_]\w*)",
+        re.MULTILINE,
+    ),
+    "TypeScript": _JS_SYMBOLS,
+    "JavaScript": _JS_SYMBOLS,
+    "Go": re.compile(r"^(?:func(?:\s+\([^)]*\))?|type)\s+([A-Za-z_]\w*)", re.MULTILINE),
+    "Rust": re.compile(
+        r"^(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?(?:fn|struct|enum|trait|mod)\s+([A-Za-z_]\w*)",
+        re.MULTILINE,
+    ),
+    "Ruby": re.compile(r"^(?:class|module|def)\s+([A-Za-z_][\w.]*)", re.MULTILINE),
+}
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    path: str
+    size: int
+    mtime_ns: int
+    language: str | None
+    symbols: tuple[str, ...]
+
+
+def _extract_symbols(path: Path, language: str | None, size: int) -> tuple[str, ...]:
+    pattern = _SYMBOL_PATTERNS.get(language or "")
+    if pattern is None or size > MAX_SYMBOL_SOURCE_BYTES:
+        return ()
+    try:
+        text = path.read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return ()
+    symbols: list[str] = []
+    for match in pattern.finditer(text):
+        name = match.group(1)
+        if name not in symbols:
+            symbols.append(name)
+        if len(symbols) == MAX_SYMBOLS_PER_FILE:
+            break
+    return tuple(symbols)
+
+
+def _git_files(root: Path) -> list[str] | None:
+    """Tracked plus untracked-but-not-ignored files, or None outside a git work tree."""
+
+    try:
+        result = subprocess.run(
+            [
+                "git",
+                "-C",
+                str(root),
+                "ls-files",
+                "-z",
+                "--cached",
+                "--others",
+                "--exclude-standard",
+            ],
+            capture_output=True,
+            timeout=GIT_LIST_TIMEOUT,
+            check=False,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    paths = {item for item in result.stdout.decode("utf-8", "replace").split("\0") if item}
+    return sorted(paths)
+
+
+def _ignore_patterns(root: Path) -> list[str]:
+    try:
+        lines = (root / ".gitignore").read_text(encoding="utf-8").splitlines()
+    except (OSError, UnicodeDecodeError):
+        return []
+    # Negations are not supported by the fallback walker; they are simply skipped.
+    return [line.strip() for line in lines if line.strip() and line[0] not in "#!"]
+
+
+def _is_ignored(relative: str, name: str, is_dir: bool, patterns: list[str]) -> bool:
+    for pattern in patterns:
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        if dir_only and not is_dir:
+            continue
+        if "/" in pattern:
+            if fnmatch.fnmatch(relative, pattern.lstrip("/")):
+                return True
+        elif fnmatch.fnmatch(name, pattern):
+            return True
+    return False
+
+
+def _walk_files(root: Path, limit: int) -> tuple[list[str], bool]:
+    """Sorted walk used outside git repositories; stops once `limit` files are found."""
+
+    patterns = _ignore_patterns(root)
+    files: list[str] = []
+    for current, dirnames, filenames in os.walk(root):
+        base = Path(current).relative_to(root)
+        dirnames[:] = sorted(
+            name
+            for name in dirnames
+            if name not in SKIPPED_DIRS
+            and not name.startswith(".")
+            and not _is_ignored((base / name).as_posix(), name, True, patterns)
+        )
+        for name in sorted(filenames):
+            relative = (base / name).as_posix()
+            if _is_ignored(relative, name, False, patterns):
+                continue
+            files.append(relative)
+            if len(files) >= limit:
+                return files, True
+    return files, False
+
+
+class WorkspaceIndexer:
+    """Keeps a digest of one workspace, rescanning at most every `refresh_interval`."""
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        refresh_interval: float = INDEX_REFRESH_INTERVAL,
+        max_files: int = MAX_INDEXED_FILES,
+        max_bytes: int = MAX_DIGEST_BYTES,
+    ) -> None:
+        self._root = root
+        self._refresh_interval = refresh_interval
+        self._max_files = max_files
+        self._max_bytes = max_bytes
+        self._entries: dict[str, FileEntry] = {}
+        self._truncated = False
+        self._digest = ""
+        self._digest_hash = ""
+        self._scanned_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    @property
+    def digest(self) -> str:
+        return self._digest
+
+    @property
+    def digest_hash(self) -> str:
+        return self._digest_hash
+
+    @property
+    def is_indexed(self) -> bool:
+        return self._scanned_at is not None
+
+    def refresh(self, *, force: bool = False) -> bool:
+        """Rescan if due; returns True when the rendered digest changed. Blocking."""
+
+        with self._lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self._scanned_at is not None
+                and now - self._scanned_at < self._refresh_interval
+            ):
+                return False
+            self._scanned_at = now
+            changed = self._scan()
+            if not changed and self._digest_hash:
+                return False
+            digest = self._render()
+            digest_hash = hashlib.sha256(digest.encode("utf-8")).hexdigest()
+            if digest_hash == self._digest_hash:
+                return False
+            self._digest, self._digest_hash = digest, digest_hash
+            return True
+
+    def _scan(self) -> bool:
+        listed = _git_files(self._root)
+        if listed is None:
+            paths, truncated = _walk_files(self._root, self._max_files)
+        else:
+            truncated = len(listed) > self._max_files
+            paths = listed[: self._max_files]
+
+        changed = truncated != self._truncated
+        entries: dict[str, FileEntry] = {}
+        for relative in paths:
+            full = self._root / relative
+            try:
+                stat = full.stat()
+            except OSError:
+                continue
+            previous = self._entries.get(relative)
+            if (
+                previous is not None
+                and previous.size == stat.st_size
+                and previous.mtime_ns == stat.st_mtime_ns
+            ):
+                entries[relative] = previous
+                continue
+            language = LANGUAGES.get(full.suffix.lower())
+            entries[relative] = FileEntry(
+                path=relative,
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                language=language,
+                symbols=_extract_symbols(full, language, stat.st_size),
+            )
+            changed = True
+        changed = changed or entries.keys() != self._entries.keys()
+        self._entries = entries
+        self._truncated = truncated
+        return changed
+
+    def _render(self) -> str:
+        entries = [self._entries[path] for path in sorted(self._entries)]
+        languages = Counter(entry.language for entry in entries if entry.language)
+        header = [
+            "<workspace_digest>",
+            "Files in the workspace (paths relative to its root, gitignored files omitted).",
+            f"Total: {len(entries)} files" + (" (listing capped)" if self._truncated else ""),
+        ]
+        if languages:
+            ranked = sorted(languages.items(), key=lambda item: (-item[1], item[0]))
+            header.append("Languages: " + ", ".join(f"{name} {count}" for name, count in ranked))
+        footer = "</workspace_digest>"
+
+        lines = list(header)
+        used = sum(len(line.encode("utf-8")) + 1 for line in lines) + len(footer) + 64
+        for index, entry in enumerate(entries):
+            line = f"- {entry.path}"
+            if entry.symbols:
+                line += ": " + ", ".join(entry.symbols)
+            size = len(line.encode("utf-8")) + 1
+            if used + size > self._max_bytes:
+                lines.append(f"- ... {len(entries) - index} more files not listed")
+                break
+            lines.append(line)
+            used += size
+        lines.append(footer)
+        return "\n".join(lines)
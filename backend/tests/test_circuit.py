@@ -0,0 +1,300 @@
+"""Tests for the Claude client circuit breaker."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import claude_code_sdk
+import pytest
+
+from palette_sidecar import circuit, claude_service
+from palette_sidecar.circuit import CircuitBreaker, CircuitOpenError
+from palette_sidecar.mcp_registry import McpConfigStore
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_then_probes_once_and_backs_off() -> None:
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    for _ in range(2):
+        breaker.acquire()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.acquire()
+    assert excinfo.value.retry_after == 10
+
+    clock.now = 10
+    assert breaker.state == "half_open"
+    breaker.acquire()
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    breaker.record_failure()
+    # A failed probe doubles the cool-down.
+    assert breaker.retry_after() == 20
+
+    clock.now = 30
+    breaker.acquire()
+    breaker.record_success()
+    assert breaker.snapshot() == {
+        "state": "closed",
+        "consecutiveFailures": 0,
+        "retryAfter": 0.0,
+        "failures": 3,
+        "opened": 2,
+        "rejected": 2,
+    }
+
+
+def test_errors_are_classified() -> None:
+    assert circuit.is_retryable(claude_code_sdk.ProcessError("crashed", exit_code=1))
+    assert circuit.is_retryable(RuntimeError("529 overloaded_error"))
+    assert not circuit.is_retryable(claude_code_sdk.CLINotFoundError())
+    assert not circuit.is_retryable(RuntimeError("401 invalid x-api-key"))
+    assert circuit.needs_reconnect(claude_code_sdk.CLIConnectionError("gone"))
+    assert not circuit.needs_reconnect(RuntimeError("529 overloaded_error"))
+    for attempt in range(1, 6):
+        assert 0 < circuit.backoff_delay(attempt) <= circuit.BACKOFF_CAP
+
+
+def test_open_circuit_fails_fast_with_retry_after(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: list[str] = []
+
+    class FailingClient:
+        def __init__(self, options: object) -> None:
+            pass
+
+        async def connect(self) -> None:
+            calls.append("connect")
+
+        async def disconnect(self) -> None:
+            pass
+
+        async def query(self, prompt: str, session_id: str = "default") -> None:
+            calls.append("query")
+            raise claude_code_sdk.ProcessError("CLI exited", exit_code=1)
+
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    monkeypatch.setattr(claude_code_sdk, "ClaudeSDKClient", FailingClient)
+    monkeypatch.setattr(claude_service, "circuit_breaker", breaker)
+    monkeypatch.setattr(claude_service, "backoff_delay", lambda attempt: 0)
+    monkeypatch.setattr(
+        claude_service, "McpConfigStore", lambda: McpConfigStore(tmp_path / ".mcp.json")
+    )
+
+    async def scenario() -> list[list[dict[str, object]]]:
+        session = claude_service.ClaudeSession()
+        session.configure(api_key="key", workspace=tmp_path)
+        results: list[list[dict[str, object]]] = []
+        for _ in range(2):
+            results.append([event async for event in session.stream("hi")])
+        await session.shutdown()
+        return results
+
+    first, second = asyncio.run(scenario())
+
+    assert [event["code"] for event in first] == ["retryable"]
+    # Every failed attempt reconnected; then the breaker opened.
+    assert calls == ["connect", "query"] * 3
+    assert second[0]["code"] == "circuit_open"
+    assert 0 < second[0]["retryAfter"] <= 30
+
+
+def test_mid_stream_crash_is_reported_and_session_released(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    class CrashingClient:
+        def __init__(self, options: object) -> None:
+            pass
+
+        async def connect(self) -> None:
+            pass
+
+        async def disconnect(self) -> None:
+            pass
+
+        async def query(self, prompt: str, session_id: str = "default") -> None:
+            pass
+
+        async def receive_response(self):
+            raise claude_code_sdk.ProcessError("CLI exited", exit_code=1)
+            yield
+
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    monkeypatch.setattr(claude_code_sdk, "ClaudeSDKClient", CrashingClient)
+    monkeypatch.setattr(claude_service, "circuit_breaker", breaker)
+    monkeypatch.setattr(
+        claude_service, "McpConfigStore", lambda: McpConfigStore(tmp_path / ".mcp.json")
+    )
+
+    async def scenario() -> list[dict[str, object]]:
+        session = claude_service.ClaudeSession()
+        session.configure(api_key="key", workspace=tmp_path)
+        events = [event async for event in session.stream("hi")]
+        # The session is released so swaps and eviction can proceed, and reconnects next time.
+        assert not session.is_busy
+        assert session._idle.is_set()
+        assert session._active_stream is None
+        assert not session.is_connected
+        await session.shutdown()
+        return events
+
+    events = asyncio.run(scenario())
+
+    assert [(event["type"], event["code"]) for event in events] == [("error", "retryable")]
+    assert breaker.snapshot()["consecutiveFailures"] == 1
+
+
+def test_query_abandoned_before_sending_does_not_hold_the_probe(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.acquire()
+    breaker.record_failure()
+    clock.now = 10
+    monkeypatch.setattr(claude_service, "circuit_breaker", breaker)
+    monkeypatch.setattr(
+        claude_service, "McpConfigStore", lambda: McpConfigStore(tmp_path / ".mcp.json")
+    )
+
+    async def scenario() -> None:
+        session = claude_service.ClaudeSession()
+        session.configure(api_key="key", workspace=tmp_path)
+        preparing = asyncio.Event()
+
+        async def slow_reload() -> bool:
+            preparing.set()
+            await asyncio.Event().wait()
+            return False
+
+        monkeypatch.setattr(session, "reload_mcp_config", slow_reload)
+
+        async def consume() -> None:
+            async for _ in session.stream("hi"):
+                pass
+
+        task = asyncio.create_task(consume())
+        await preparing.wait()
+        # The client disconnects while the query is still being prepared.
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+
+    assert breaker.state == "half_open"
+    breaker.acquire()
+
+
+@pytest.mark.parametrize("outcome", ["crash", "error_result"])
+def test_repeated_mid_stream_failures_open_the_circuit(
+    outcome: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    class FlakyClient:
+        def __init__(self, options: object) -> None:
+            pass
+
+        async def connect(self) -> None:
+            pass
+
+        async def disconnect(self) -> None:
+            pass
+
+        async def query(self, prompt: str, session_id: str = "default") -> None:
+            pass
+
+        async def receive_response(self):
+            if outcome == "crash":
+                raise claude_code_sdk.ProcessError("CLI exited", exit_code=1)
+            yield claude_code_sdk.ResultMessage(
+                subtype="error_during_execution",
+                duration_ms=1,
+                duration_api_ms=1,
+                is_error=True,
+                num_turns=1,
+                session_id="sdk",
+                result="529 overloaded_error",
+            )
+
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    monkeypatch.setattr(claude_code_sdk, "ClaudeSDKClient", FlakyClient)
+    monkeypatch.setattr(claude_service, "circuit_breaker", breaker)
+    monkeypatch.setattr(
+        claude_service, "McpConfigStore", lambda: McpConfigStore(tmp_path / ".mcp.json")
+    )
+
+    async def scenario() -> list[dict[str, object]]:
+        session = claude_service.ClaudeSession()
+        session.configure(api_key="key", workspace=tmp_path)
+        events: list[dict[str, object]] = []
+        for _ in range(4):
+            events.extend([event async for event in session.stream("hi")])
+        await session.shutdown()
+        return events
+
+    events = asyncio.run(scenario())
+
+    # Sending the prompt is not a success, so the failures add up and the fourth query
+    # fails fast.
+    assert breaker.snapshot()["consecutiveFailures"] == 3
+    assert breaker.state == "open"
+    assert events[-1]["code"] == "circuit_open"
+
+
+def test_successful_result_closes_a_half_open_circuit(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    class HealthyClient:
+        def __init__(self, options: object) -> None:
+            pass
+
+        async def connect(self) -> None:
+            pass
+
+        async def disconnect(self) -> None:
+            pass
+
+        async def query(self, prompt: str, session_id: str = "default") -> None:
+            assert breaker.state == "half_open"
+
+        async def receive_response(self):
+            yield claude_code_sdk.ResultMessage(
+                subtype="success",
+                duration_ms=1,
+                duration_api_ms=1,
+                is_error=False,
+                num_turns=1,
+                session_id="sdk",
+            )
+
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.acquire()
+    breaker.record_failure()
+    clock.now = 10
+    monkeypatch.setattr(claude_code_sdk, "ClaudeSDKClient", HealthyClient)
+    monkeypatch.setattr(claude_service, "circuit_breaker", breaker)
+    monkeypatch.setattr(
+        claude_service, "McpConfigStore", lambda: McpConfigStore(tmp_path / ".mcp.json")
+    )
+
+    async def scenario() -> None:
+        session = claude_service.ClaudeSession()
+        session.configure(api_key="key", workspace=tmp_path)
+        async for _ in session.stream("hi"):
+            pass
+        await session.shutdown()
+
+    asyncio.run(scenario())
+    assert breaker.state == "closed"
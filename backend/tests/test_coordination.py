@@ -0,0 +1,162 @@
+"""Tests for cross-worker ownership and request forwarding."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from palette_sidecar.coordination import PERMISSION_OWNERSHIP, SESSION_OWNERSHIP, WorkerCoordinator
+
+
+def test_requests_are_forwarded_to_the_owning_worker(tmp_path: Path) -> None:
+    approvals: list[dict[str, Any]] = []
+
+    async def approve(request: dict[str, Any]) -> dict[str, Any]:
+        approvals.append(request)
+        return {"status": "ok"}
+
+    async def query(request: dict[str, Any]) -> AsyncIterator[dict[str, Any]]:
+        for index in range(3):
+            yield {"type": "assistant_text", "text": f"{request['prompt']}-{index}"}
+
+    async def scenario() -> None:
+        owner, other = WorkerCoordinator(tmp_path), WorkerCoordinator(tmp_path)
+        await owner.start({"approve": approve, "query": query})
+        await other.start({})
+        try:
+            assert await owner.claim(PERMISSION_OWNERSHIP, "req-1") is None
+            socket = await other.owner_of(PERMISSION_OWNERSHIP, "req-1")
+            assert socket is not None
+            assert await owner.owner_of(PERMISSION_OWNERSHIP, "req-1") is None
+
+            decision = {"request_id": "req-1", "decision": "allow"}
+            result = await other.call(socket, "approve", decision)
+            assert result == {"status": "ok"}
+            assert approvals == [{"request_id": "req-1", "decision": "allow"}]
+
+            await owner.release(PERMISSION_OWNERSHIP, "req-1")
+            assert await other.owner_of(PERMISSION_OWNERSHIP, "req-1") is None
+
+            assert await owner.claim(SESSION_OWNERSHIP, "default") is None
+            routed = await other.claim(SESSION_OWNERSHIP, "default")
+            assert routed == socket
+            assert await owner.worker_count() == 2
+            events = [event async for event in other.stream(routed, "query", {"prompt": "hi"})]
+            assert [event["text"] for event in events] == ["hi-0", "hi-1", "hi-2"]
+        finally:
+            await other.stop()
+            await owner.stop()
+
+    asyncio.run(scenario())
+
+
+def test_ownership_of_dead_workers_is_taken_over(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        worker = WorkerCoordinator(tmp_path)
+        await worker.start({})
+        try:
+            with sqlite3.connect(tmp_path / "coordination.sqlite3") as conn:
+                conn.execute(
+                    "INSERT INTO workers VALUES ('ghost', 999999999, '/nonexistent.sock', 0)"
+                )
+                conn.execute("INSERT INTO ownership VALUES ('session', 'default', 'ghost', 0)")
+            assert await worker.claim(SESSION_OWNERSHIP, "default") is None
+        finally:
+            await worker.stop()
+
+    asyncio.run(scenario())
+
+
+def test_unreachable_owner_is_reported_as_unavailable(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from fastapi.testclient import TestClient
+
+    from palette_sidecar import api
+
+    async def stale_owner(kind: str, key: str) -> str:
+        # The owner's process is still alive but its socket is already gone.
+        return str(tmp_path / "worker-gone.sock")
+
+    monkeypatch.setattr(api.coordinator, "owner_of", stale_owner)
+    client = TestClient(api.app)
+
+    cancel = client.post("/cancel", json={"session_id": "elsewhere"})
+    approve = client.post("/approve", json={"request_id": "elsewhere", "decision": "allow"})
+
+    assert cancel.status_code == 503
+    assert approve.status_code == 503
+
+
+def test_hung_owner_is_taken_over(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from palette_sidecar import coordination
+
+    monkeypatch.setattr(coordination, "OWNER_PING_TIMEOUT", 0.1)
+
+    async def never_answer(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await asyncio.sleep(10)
+
+    async def scenario() -> None:
+        hung_socket = tmp_path / "hung.sock"
+        hung = await asyncio.start_unix_server(never_answer, path=str(hung_socket))
+        worker = WorkerCoordinator(tmp_path)
+        await worker.start({})
+        try:
+            with sqlite3.connect(tmp_path / "coordination.sqlite3") as conn:
+                # Alive (our own pid) but not answering on its socket.
+                conn.execute(
+                    "INSERT INTO workers VALUES ('hung', ?, ?, 0)", (os.getpid(), str(hung_socket))
+                )
+                conn.execute("INSERT INTO ownership VALUES ('session', 'named', 'hung', 0)")
+            assert await worker.claim(SESSION_OWNERSHIP, "named") is None
+            with sqlite3.connect(tmp_path / "coordination.sqlite3") as conn:
+                row = conn.execute("SELECT worker_id FROM ownership WHERE key = 'named'").fetchone()
+            assert row[0] != "hung"
+        finally:
+            await worker.stop()
+            hung.close()
+
+    asyncio.run(scenario())
+
+
+def test_session_claim_is_released_when_the_local_stream_ends(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from palette_sidecar import api
+    from palette_sidecar.resume import ResumeStore
+
+    class FakeTarget:
+        async def stream(self, prompt: str, session_id: str) -> AsyncIterator[dict[str, Any]]:
+            yield {"type": "result", "data": {}}
+
+    class FakeSessions:
+        @asynccontextmanager
+        async def checkout(self, workspace: Path | None) -> AsyncGenerator[FakeTarget, None]:
+            yield FakeTarget()
+
+    async def scenario() -> None:
+        worker, other = WorkerCoordinator(tmp_path), WorkerCoordinator(tmp_path)
+        await worker.start({})
+        await other.start({})
+        monkeypatch.setattr(api, "coordinator", worker)
+        monkeypatch.setattr(api, "workspace_sessions", FakeSessions())
+        monkeypatch.setattr(api, "resume_store", ResumeStore(tmp_path / "sessions.json"))
+        monkeypatch.setattr(api, "_sync_external_settings", lambda: None)
+        try:
+            events = [event async for event in api._routed_events("hi", "default")]
+            assert events == [{"type": "result", "data": {}}]
+            # Unnamed queries are not pinned: the next one may run on any worker.
+            assert await other.claim(SESSION_OWNERSHIP, "default") is None
+            assert api._local_streams == {}
+        finally:
+            await other.stop()
+            await worker.stop()
+
+    asyncio.run(scenario())
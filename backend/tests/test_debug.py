@@ -0,0 +1,55 @@
+"""Tests for the opt-in profiling surface."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from palette_sidecar.debug import LoopLagMonitor, router
+
+
+def _block_the_loop() -> None:
+    time.sleep(0.3)
+
+
+def test_lag_monitor_records_stall_with_blocking_stack() -> None:
+    monitor = LoopLagMonitor(interval=0.02, threshold=0.1)
+
+    async def scenario() -> None:
+        task = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.05)
+        _block_the_loop()
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(scenario())
+
+    snapshot = monitor.snapshot()
+    assert snapshot["stallCount"] == 1
+    stall = snapshot["recent"][0]
+    assert stall["durationMs"] >= 200
+    assert any("_block_the_loop" in line for line in stall["stack"])
+
+
+def test_profile_and_memory_endpoints() -> None:
+    app = FastAPI()
+    app.include_router(router)
+    with TestClient(app) as client:
+        collapsed = client.post("/debug/profile", params={"seconds": 0.1})
+        assert collapsed.status_code == 200
+        assert collapsed.text.strip().splitlines()[0].rsplit(" ", 1)[1].isdigit()
+
+        summary = client.post("/debug/profile", params={"seconds": 0.1, "format": "json"}).json()
+        assert summary["samples"] > 0
+
+        assert client.get("/debug/memory").json()["tracing"] == "started"
+        retained = [bytearray(1024) for _ in range(100)]
+        diff = client.get("/debug/memory", params={"top": 5}).json()
+        assert diff["tracing"] == "active"
+        assert len(diff["diff"]) <= 5
+        assert diff["pendingTools"] == 0
+        assert client.delete("/debug/memory").json() == {"tracing": "stopped"}
+        del retained
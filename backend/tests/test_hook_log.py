@@ -0,0 +1,55 @@
+"""Tests for the queue-backed NDJSON hook event log."""
+
+from __future__ import annotations
+
+import json
+import logging
+from pathlib import Path
+
+import pytest
+
+from palette_sidecar.hook_log import HookEventLogger, parse_level, parse_sample_rates
+
+
+def test_events_are_written_as_ndjson_off_thread(tmp_path: Path) -> None:
+    path = tmp_path / "logs" / "hooks.ndjson"
+    hook_log = HookEventLogger(sample_rates={"auto_allow": 0.0})
+    hook_log.start(path)
+    try:
+        hook_log.log("permission_request", request_id="abc", tool="Write", path=Path("/tmp/x"))
+        hook_log.log("auto_allow", request_id="dropped")
+        hook_log.log("query_retry", level=logging.DEBUG, attempt=1)
+    finally:
+        hook_log.stop()
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert len(lines) == 1
+    assert lines[0]["event"] == "permission_request"
+    assert lines[0]["path"] == "/tmp/x"
+    assert lines[0]["level"] == "INFO"
+
+
+def test_parse_sample_rates_clamps_and_skips_garbage() -> None:
+    assert parse_sample_rates("auto_allow=0.1, query_retry=2,bad,x=nope") == {
+        "auto_allow": 0.1,
+        "query_retry": 1.0,
+    }
+    assert parse_sample_rates(None) == {}
+
+
+def test_bad_configuration_falls_back_with_a_warning(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    with caplog.at_level(logging.WARNING, logger="palette_sidecar.hook_log"):
+        assert parse_sample_rates("auto_allow=0.1,=0.5,x") == {"auto_allow": 0.1}
+        assert parse_level("verbose") == logging.INFO
+    assert len(caplog.records) == 3
+    assert parse_level("debug") == logging.DEBUG
+    assert parse_level("15") == 15
+
+    hook_log = HookEventLogger()
+    hook_log.start(tmp_path / "hooks.ndjson", level="verbose")
+    try:
+        assert logging.getLogger("palette_sidecar.hooks").level == logging.INFO
+    finally:
+        hook_log.stop()
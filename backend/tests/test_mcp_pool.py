@@ -0,0 +1,182 @@
+"""Tests for the pooled stdio MCP servers and their SSE proxy."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from palette_sidecar import mcp_pool as pool_module
+from palette_sidecar.mcp_pool import McpServerPool
+
+FAKE_SERVER = """
+import json, os, sys
+for line in sys.stdin:
+    message = json.loads(line)
+    if "id" not in message:
+        continue
+    method = message["method"]
+    if method == "initialize":
+        result = {
+            "protocolVersion": "2024-11-05", "serverInfo": {"name": "fake"}, "capabilities": {}
+        }
+    elif method == "tools/list":
+        result = {"tools": [{"name": "echo"}], "pid": os.getpid(), "mode": os.environ.get("MODE")}
+    elif method == "crash":
+        sys.exit(1)
+    else:
+        result = {}
+    sys.stdout.write(json.dumps({"jsonrpc": "2.0", "id": message["id"], "result": result}) + "\\n")
+    sys.stdout.flush()
+"""
+
+
+class SseClient:
+    def __init__(self, port: int, url: str) -> None:
+        self.port = port
+        self.url = url
+        self.endpoint = ""
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection("127.0.0.1", self.port)
+        self._writer.write(f"GET {self.url} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await self._writer.drain()
+        while (await self._reader.readline()) not in (b"\r\n", b""):
+            pass
+        event, data = await self._next_event()
+        assert event == "endpoint"
+        self.endpoint = data
+
+    async def _next_event(self) -> tuple[str, str]:
+        assert self._reader is not None
+        event = data = ""
+        while True:
+            line = (await self._reader.readline()).decode().rstrip("\n")
+            if line.startswith("event: "):
+                event = line.removeprefix("event: ")
+            elif line.startswith("data: "):
+                data = line.removeprefix("data: ")
+            elif not line and event:
+                return event, data
+
+    async def call(self, message: dict[str, Any]) -> dict[str, Any]:
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        body = json.dumps(message).encode()
+        writer.write(
+            f"POST {self.endpoint} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        assert (await reader.readline()).startswith(b"HTTP/1.1 202")
+        writer.close()
+        _, data = await asyncio.wait_for(self._next_event(), 10)
+        return json.loads(data)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def test_pool_shares_one_process_and_restarts_it(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(pool_module, "BACKOFF_INITIAL", 0.05)
+    script = tmp_path / "fake_mcp.py"
+    script.write_text(FAKE_SERVER, encoding="utf-8")
+    servers = {"fake": {"command": sys.executable, "args": [str(script)]}}
+
+    async def scenario() -> None:
+        pool = McpServerPool()
+        await pool.start()
+        await pool.sync(servers)
+        url = pool.client_configs(servers)["fake"]["url"]
+        port = int(url.split(":")[2].split("/")[0])
+        path = url.split(str(port), 1)[1]
+
+        first, second = SseClient(port, path), SseClient(port, path)
+        await first.connect()
+        await second.connect()
+
+        init = await first.call({"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {}})
+        assert init == {
+            "jsonrpc": "2.0",
+            "id": 0,
+            "result": {
+                "protocolVersion": "2024-11-05",
+                "serverInfo": {"name": "fake"},
+                "capabilities": {},
+            },
+        }
+        listed_a = await first.call({"jsonrpc": "2.0", "id": "a", "method": "tools/list"})
+        listed_b = await second.call({"jsonrpc": "2.0", "id": "a", "method": "tools/list"})
+        assert listed_a["id"] == listed_b["id"] == "a"
+        assert listed_a["result"]["pid"] == listed_b["result"]["pid"]
+        assert pool.status()["fake"]["sessions"] == 2
+
+        crashed = await first.call({"jsonrpc": "2.0", "id": 7, "method": "crash"})
+        assert crashed["id"] == 7 and "error" in crashed
+
+        relisted = await first.call({"jsonrpc": "2.0", "id": 8, "method": "tools/list"})
+        if "method" in relisted:  # list_changed notification after the restart
+            relisted = await first.call({"jsonrpc": "2.0", "id": 9, "method": "tools/list"})
+        assert relisted["result"]["pid"] != listed_a["result"]["pid"]
+        assert pool.status()["fake"]["restarts"] == 1
+
+        first.close()
+        second.close()
+        await pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_config_edits_restart_in_place_and_keep_sessions(tmp_path: Path) -> None:
+    script = tmp_path / "fake_mcp.py"
+    script.write_text(FAKE_SERVER, encoding="utf-8")
+    servers = {"fake": {"command": sys.executable, "args": [str(script)], "env": {"MODE": "a"}}}
+    edited = {"fake": {**servers["fake"], "env": {"MODE": "b"}}}
+
+    async def scenario() -> None:
+        pool = McpServerPool()
+        await pool.start()
+        await pool.sync(servers)
+        url = pool.client_configs(servers)["fake"]["url"]
+        assert pool.client_configs(edited)["fake"]["url"] == url
+        port = int(url.split(":")[2].split("/")[0])
+        client = SseClient(port, url.split(str(port), 1)[1])
+        await client.connect()
+
+        before = await client.call({"jsonrpc": "2.0", "id": 1, "method": "tools/list"})
+        assert before["result"]["mode"] == "a"
+
+        await pool.sync(edited)
+        changed = await client.call({"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        if "method" in changed:
+            assert changed["method"] == "notifications/tools/list_changed"
+            changed = await client.call({"jsonrpc": "2.0", "id": 3, "method": "tools/list"})
+        assert changed["result"]["mode"] == "b"
+        assert changed["result"]["pid"] != before["result"]["pid"]
+        assert pool.status()["fake"]["sessions"] == 1
+
+        client.close()
+        await pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_client_configs_only_rewrite_stdio_servers() -> None:
+    pool = McpServerPool()
+    servers = {
+        "local": {"command": "srv"},
+        "remote": {"type": "sse", "url": "https://example.com/sse"},
+    }
+    assert pool.client_configs(servers) == servers
+
+    pool._port = 4242
+    rewritten = pool.client_configs(servers)
+    assert rewritten["local"] == {"type": "sse", "url": "http://127.0.0.1:4242/mcp/local/sse"}
+    assert rewritten["remote"] == servers["remote"]
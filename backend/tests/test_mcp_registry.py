@@ -0,0 +1,177 @@
+"""Tests for MCP manifest translation and the hot-reloading config store."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import claude_code_sdk
+import pytest
+
+from palette_sidecar.mcp_registry import McpConfigStore, to_mcp_config
+
+
+def _write(path: Path, payload: object, *, bump: int = 0) -> None:
+    path.write_text(payload if isinstance(payload, str) else json.dumps(payload), encoding="utf-8")
+    stat = path.stat()
+    # Force a distinct mtime so the stamp check can't be fooled by coarse clocks.
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + bump * 1_000_000_000))
+
+
+def test_to_mcp_config_accepts_mcp_json_entries() -> None:
+    assert to_mcp_config({"command": "srv", "args": ["-x"]}) == {
+        "command": "srv",
+        "args": ["-x"],
+        "env": {},
+    }
+    assert to_mcp_config({"type": "sse", "url": "http://x/sse"})["type"] == "sse"
+    with pytest.raises(ValueError):
+        to_mcp_config({"transport": "carrier-pigeon"})
+
+
+def test_store_reloads_on_change_and_keeps_last_good(tmp_path: Path) -> None:
+    path = tmp_path / ".mcp.json"
+    store = McpConfigStore(path)
+    assert store.refresh() is False
+    assert store.servers == {}
+
+    _write(path, {"mcpServers": {"docs": {"command": "docs-server"}}}, bump=1)
+    assert store.refresh() is True
+    assert set(store.servers) == {"docs"}
+    good_digest = store.digest
+
+    # Unchanged stamp is a no-op.
+    assert store.refresh() is False
+
+    _write(path, "{not json", bump=2)
+    assert store.refresh() is False
+    assert set(store.servers) == {"docs"}
+    assert store.digest == good_digest
+
+    _write(path, {"mcpServers": {"docs": {"type": "carrier-pigeon"}}}, bump=3)
+    assert store.refresh() is False
+    assert store.digest == good_digest
+
+    # Rewriting equivalent content keeps the digest, so no client swap is needed.
+    _write(path, {"mcpServers": {"docs": {"command": "docs-server", "args": []}}}, bump=4)
+    assert store.refresh() is False
+
+    path.unlink()
+    assert store.refresh() is True
+    assert store.servers == {}
+
+
+def test_store_substitutes_environment(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("DOCS_TOKEN", "secret")
+    path = tmp_path / ".mcp.json"
+    _write(
+        path,
+        {
+            "mcpServers": {
+                "docs": {"type": "sse", "url": "http://x", "headers": {"A": "${DOCS_TOKEN}"}}
+            }
+        },
+    )
+    store = McpConfigStore(path)
+    assert store.refresh() is True
+    assert store.servers["docs"]["headers"] == {"A": "secret"}
+
+
+def test_session_warm_swaps_only_when_servers_change(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from palette_sidecar import claude_service
+
+    connected: list[dict[str, object]] = []
+    disconnected: list[object] = []
+
+    class FakeClient:
+        def __init__(self, options: Any) -> None:
+            self.servers = options.mcp_servers
+
+        async def connect(self) -> None:
+            connected.append(self.servers)
+
+        async def disconnect(self) -> None:
+            disconnected.append(self)
+
+    monkeypatch.setattr(claude_code_sdk, "ClaudeSDKClient", FakeClient)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "key")
+    path = tmp_path / ".mcp.json"
+    monkeypatch.setattr(claude_service, "McpConfigStore", lambda: McpConfigStore(path))
+
+    async def scenario() -> None:
+        session = claude_service.ClaudeSession()
+        session.configure(api_key="key", workspace=tmp_path)
+        await session.start()
+        assert await session.reload_mcp_config() is False
+
+        _write(path, {"mcpServers": {"docs": {"command": "docs-server"}}}, bump=1)
+        assert await session.reload_mcp_config() is True
+        assert session._swap_task is not None
+        await session._swap_task
+        assert set(connected[-1]) == {"docs"}
+        assert len(disconnected) == 1
+
+        # Malformed edits never reach the client.
+        _write(path, "{broken", bump=2)
+        assert await session.reload_mcp_config() is False
+        await session.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_failed_warm_swaps_back_off(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from palette_sidecar import claude_service
+
+    attempts: list[dict[str, object]] = []
+
+    class FakeClient:
+        def __init__(self, options: Any) -> None:
+            self.servers = options.mcp_servers
+
+        async def connect(self) -> None:
+            attempts.append(self.servers)
+            if self.servers:
+                raise claude_code_sdk.CLIConnectionError("MCP server failed to start")
+
+        async def disconnect(self) -> None:
+            pass
+
+    now = [0.0]
+    monkeypatch.setattr(
+        claude_service,
+        "time",
+        SimpleNamespace(monotonic=lambda: now[0], perf_counter=time.perf_counter),
+    )
+    monkeypatch.setattr(claude_code_sdk, "ClaudeSDKClient", FakeClient)
+    path = tmp_path / ".mcp.json"
+    monkeypatch.setattr(claude_service, "McpConfigStore", lambda: McpConfigStore(path))
+
+    async def scenario() -> None:
+        session = claude_service.ClaudeSession()
+        session.configure(api_key="key", workspace=tmp_path)
+        await session.start()
+
+        _write(path, {"mcpServers": {"docs": {"type": "sse", "url": "http://x"}}}, bump=1)
+        for delay in (2.0, 4.0, 8.0):
+            assert await session.reload_mcp_config() is True
+            assert session._swap_task is not None
+            await session._swap_task
+            # Not retried before the backoff elapses.
+            now[0] += delay - 0.5
+            assert await session.reload_mcp_config() is False
+            now[0] += 0.5
+        assert len(attempts) == 4
+
+        # A further edit is tried straight away.
+        _write(path, {"mcpServers": {"docs": {"type": "sse", "url": "http://y"}}}, bump=2)
+        assert await session.reload_mcp_config() is True
+        await session.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,96 @@
+"""Tests for the cached liveness/readiness probes."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import claude_code_sdk
+import pytest
+
+from palette_sidecar import claude_service, probes
+from palette_sidecar.mcp_registry import McpConfigStore
+
+
+class FakeControl:
+    def __init__(self) -> None:
+        self.hang = False
+
+    async def set_permission_mode(self, mode: str) -> None:
+        assert mode == "default"
+        if self.hang:
+            await asyncio.sleep(10)
+
+
+class FakeClient:
+    def __init__(self, options: object) -> None:
+        self._query = FakeControl()
+
+    async def connect(self) -> None:
+        pass
+
+    async def disconnect(self) -> None:
+        pass
+
+
+def test_readiness_follows_client_ping(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(claude_code_sdk, "ClaudeSDKClient", FakeClient)
+    monkeypatch.setattr(
+        claude_service, "McpConfigStore", lambda: McpConfigStore(tmp_path / ".mcp.json")
+    )
+    monkeypatch.setattr(probes, "detect_prerequisites", lambda: {"node": True, "claude_cli": True})
+    primary = claude_service.ClaudeSession()
+    primary.configure(api_key="key", workspace=tmp_path)
+    monkeypatch.setattr(probes, "workspace_sessions", claude_service.WorkspaceSessions(primary))
+    prober = probes.HealthProber(ping_timeout=0.05)
+
+    async def scenario() -> None:
+        assert prober.readiness()[1]["reasons"] == ["starting"]
+
+        await prober.refresh()
+        ready, payload = prober.readiness()
+        assert not ready and payload["reasons"] == ["client not connected"]
+
+        await primary.start()
+        await prober.refresh()
+        ready, payload = prober.readiness()
+        assert ready, payload
+        client = payload["clients"][0]
+        assert client["connected"] and client["pingMs"] is not None
+        assert client["connectMs"] is not None
+
+        primary._client._query.hang = True  # type: ignore[union-attr]
+        await prober.refresh()
+        ready, payload = prober.readiness()
+        assert not ready
+        assert payload["reasons"] == ["client unresponsive: ping timed out after 0.05s"]
+        await primary.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_liveness_and_readiness_endpoints(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from fastapi.testclient import TestClient
+
+    from palette_sidecar import api
+    from palette_sidecar.resume import ResumeStore
+
+    # Run the real lifespan, but against a scratch home and without a Claude client.
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(api.settings_store, "_path", tmp_path / "config.json")
+    monkeypatch.setattr(api, "resume_store", ResumeStore(tmp_path / "sessions.json"))
+    monkeypatch.setattr(api, "HOOK_LOG_FILE", tmp_path / "logs" / "hooks.ndjson")
+    monkeypatch.setattr(api, "MCP_POOL_ENABLED", False)
+
+    async def no_warm_up() -> None:
+        pass
+
+    monkeypatch.setattr(api, "_warm_up", no_warm_up)
+
+    with TestClient(api.app) as client:
+        assert client.get("/livez").json()["status"] == "ok"
+        response = client.get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["status"] == "not_ready"
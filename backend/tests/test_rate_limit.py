@@ -0,0 +1,171 @@
+"""Tests for the client-side rate limiter."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from palette_sidecar import claude_service
+from palette_sidecar.circuit import CircuitBreaker
+from palette_sidecar.config import DEFAULT_MODEL
+from palette_sidecar.mcp_registry import McpConfigStore
+from palette_sidecar.rate_limit import RateLimiter, RateLimitExceeded, is_rate_limited
+
+MODEL = "test-model"
+CATALOG = {MODEL: {"requests_per_minute": 2, "input_tokens_per_minute": 10000}}
+
+
+class FakeTime:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def clock(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _limiter(fake: FakeTime, max_wait: float = 60.0) -> RateLimiter:
+    return RateLimiter(CATALOG, max_wait=max_wait, clock=fake.clock, sleep=fake.sleep)
+
+
+def test_requests_queue_until_the_bucket_refills() -> None:
+    fake = FakeTime()
+    limiter = _limiter(fake)
+
+    async def scenario() -> None:
+        for _ in range(3):
+            await limiter.acquire(MODEL, "hi")
+
+    asyncio.run(scenario())
+    # Two requests fit the burst; the third waits for half a minute's refill.
+    assert fake.sleeps == [pytest.approx(30.0)]
+
+
+def test_waits_longer_than_max_wait_fail_with_retry_after() -> None:
+    fake = FakeTime()
+    limiter = _limiter(fake, max_wait=5.0)
+
+    async def scenario() -> None:
+        await limiter.acquire(MODEL, "hi")
+        await limiter.acquire(MODEL, "hi")
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            await limiter.acquire(MODEL, "hi")
+        assert excinfo.value.retry_after == pytest.approx(30.0)
+
+    asyncio.run(scenario())
+    assert fake.sleeps == []
+
+
+def test_usage_reconciles_tokens_and_rate_limits_slow_the_pace() -> None:
+    fake = FakeTime()
+    limiter = _limiter(fake)
+
+    async def scenario() -> None:
+        reservation = await limiter.acquire(MODEL, "hi")
+        assert reservation.tokens == 2000
+        limiter.record_usage(
+            reservation, {"input_tokens": 500, "cache_creation_input_tokens": 500}
+        )
+        state = limiter.snapshot()[MODEL]
+        assert state["tokensAvailable"] == 9000
+        assert state["estimatedTokensPerQuery"] == 1800
+
+        limiter.record_rate_limited(MODEL)
+        state = limiter.snapshot()[MODEL]
+        assert state["scale"] == 0.5
+        assert state["requestsPerMinute"] == 1
+        assert state["blockedFor"] == 5.0
+        assert state["rateLimited"] == 1
+
+        reservation = await limiter.acquire(MODEL, "hi")
+        assert fake.sleeps and fake.now >= 5.0
+        # The rate-limited result itself does not count as a recovery step.
+        limiter.record_usage(reservation, {"input_tokens": 1800}, succeeded=False)
+        assert limiter.snapshot()[MODEL]["scale"] == 0.5
+
+        reservation = await limiter.acquire(MODEL, "hi")
+        limiter.record_usage(reservation, {"input_tokens": 1800})
+        assert limiter.snapshot()[MODEL]["scale"] == 0.55
+
+    asyncio.run(scenario())
+
+
+def test_unknown_models_are_not_limited() -> None:
+    limiter = RateLimiter(CATALOG)
+    reservation = asyncio.run(limiter.acquire("other-model", "hi"))
+    assert reservation.settled
+    assert is_rate_limited("Error: 429 rate_limit_error")
+    assert not is_rate_limited("overloaded_error")
+
+
+def test_unsent_queries_return_their_request_slot() -> None:
+    fake = FakeTime()
+    limiter = _limiter(fake)
+
+    async def scenario() -> None:
+        unsent = await limiter.acquire(MODEL, "hi")
+        limiter.refund(unsent)
+        sent = await limiter.acquire(MODEL, "hi")
+        limiter.refund(sent, sent=True)
+
+    asyncio.run(scenario())
+    state = limiter.snapshot()[MODEL]
+    assert state["requestsAvailable"] == 1
+    assert state["tokensAvailable"] == 10000
+
+
+def test_open_circuit_fails_fast_without_spending_the_limiter(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    fake = FakeTime()
+    limiter = RateLimiter(
+        {DEFAULT_MODEL: CATALOG[MODEL]}, max_wait=60.0, clock=fake.clock, sleep=fake.sleep
+    )
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.acquire()
+    breaker.record_failure()
+    monkeypatch.setattr(claude_service, "rate_limiter", limiter)
+    monkeypatch.setattr(claude_service, "circuit_breaker", breaker)
+    monkeypatch.setattr(
+        claude_service, "McpConfigStore", lambda: McpConfigStore(tmp_path / ".mcp.json")
+    )
+
+    async def scenario() -> list[dict[str, object]]:
+        session = claude_service.ClaudeSession()
+        session.configure(api_key="key", workspace=tmp_path)
+        events: list[dict[str, object]] = []
+        for _ in range(3):
+            events.extend([event async for event in session.stream("hi")])
+        return events
+
+    events = asyncio.run(scenario())
+
+    assert [event["code"] for event in events] == ["circuit_open"] * 3
+    assert fake.sleeps == []
+    assert limiter.snapshot() == {}
+
+
+def test_workers_pace_at_their_share_of_the_limits() -> None:
+    fake = FakeTime()
+    limiter = _limiter(fake)
+    limiter.set_workers(2)
+
+    async def scenario() -> None:
+        await limiter.acquire(MODEL, "hi")
+        await limiter.acquire(MODEL, "hi")
+
+    asyncio.run(scenario())
+    state = limiter.snapshot()[MODEL]
+    assert state["requestsPerMinute"] == 1
+    assert state["tokensPerMinute"] == 5000
+    # Half the burst, then a wait for a minute's refill at half the rate.
+    assert fake.sleeps == [pytest.approx(60.0)]
+
+    limiter.set_workers(1)
+    assert limiter.snapshot()[MODEL]["requestsPerMinute"] == 2
@@ -0,0 +1,217 @@
+"""Tests for resuming SDK conversations across reconnects."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import claude_code_sdk
+import pytest
+
+from palette_sidecar import claude_service, resume
+from palette_sidecar.mcp_registry import McpConfigStore
+from palette_sidecar.resume import ResumeStore
+
+
+def test_store_keeps_most_recent_sessions_and_merges_on_save(tmp_path: Path) -> None:
+    path = tmp_path / "sessions.json"
+    workspace = tmp_path / "repo"
+    store = ResumeStore(path, capacity=2, debounce=0)
+    other = ResumeStore(path, capacity=2, debounce=0)
+
+    async def scenario() -> None:
+        store.record(workspace, "a", "sdk-a")
+        store.record(workspace, "b", "sdk-b")
+        assert store.lookup(workspace, "a") == "sdk-a"
+        store.record(workspace, "c", "sdk-c")
+        # "b" was least recently used once "a" was looked up again.
+        assert store.lookup(workspace, "b") is None
+        assert len(store) == 2
+        await store.flush()
+
+        other.load()
+        other.forget(workspace, "a")
+        other.record(workspace, "d", "sdk-d")
+        await other.flush()
+
+    asyncio.run(scenario())
+
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert [entry["session_id"] for entry in saved] == ["c", "d"]
+    reloaded = ResumeStore(path)
+    reloaded.load()
+    assert reloaded.lookup(workspace, "c") == "sdk-c"
+    assert reloaded.lookup(tmp_path / "elsewhere", "c") is None
+
+
+def test_changes_made_during_a_write_are_persisted(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "sessions.json"
+    workspace = tmp_path / "repo"
+    store = ResumeStore(path, debounce=0.01)
+    real_write = resume.atomic_write
+    writing = threading.Event()
+
+    def slow_write(target: Path, content: str) -> None:
+        writing.set()
+        time.sleep(0.2)
+        real_write(target, content)
+
+    monkeypatch.setattr(resume, "atomic_write", slow_write)
+
+    async def scenario() -> None:
+        store.record(workspace, "a", "sdk-a")
+        store.record(workspace, "b", "sdk-b")
+        store.forget(workspace, "b")
+        while not writing.is_set():
+            await asyncio.sleep(0.01)
+        store.record(workspace, "c", "sdk-c")
+        await asyncio.sleep(0.6)
+
+    asyncio.run(scenario())
+
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert [entry["session_id"] for entry in saved] == ["a", "c"]
+    assert store._forgotten == set()
+
+
+class FakeCli:
+    """Records the `resume` each client connects with; stale transcripts fail to resume."""
+
+    def __init__(self) -> None:
+        self.resumes: list[str | None] = []
+        self.stale: set[str] = set()
+
+    def client(self, options: Any) -> FakeClient:
+        return FakeClient(options, self)
+
+
+class FakeClient:
+    def __init__(self, options: Any, cli: FakeCli) -> None:
+        self.resume = options.resume
+        self.cli = cli
+
+    async def connect(self) -> None:
+        self.cli.resumes.append(self.resume)
+        if self.resume in self.cli.stale:
+            raise claude_code_sdk.ProcessError("No conversation found", exit_code=1)
+
+    async def disconnect(self) -> None:
+        pass
+
+    async def query(self, prompt: str, session_id: str = "default") -> None:
+        pass
+
+    async def receive_response(self):
+        yield claude_code_sdk.ResultMessage(
+            subtype="success",
+            duration_ms=1,
+            duration_api_ms=1,
+            is_error=False,
+            num_turns=1,
+            session_id=f"sdk-{len(self.cli.resumes)}",
+        )
+
+
+def test_reconnect_resumes_the_palette_sessions_conversation(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cli = FakeCli()
+    store = ResumeStore(tmp_path / "sessions.json", debounce=0)
+    monkeypatch.setattr(claude_code_sdk, "ClaudeSDKClient", cli.client)
+    monkeypatch.setattr(claude_service, "resume_store", store)
+    monkeypatch.setattr(
+        claude_service, "McpConfigStore", lambda: McpConfigStore(tmp_path / ".mcp.json")
+    )
+
+    async def scenario() -> None:
+        session = claude_service.ClaudeSession()
+        session.configure(api_key="key", workspace=tmp_path)
+        [_ async for _ in session.stream("hi", session_id="palette")]
+        await session.shutdown()
+        [_ async for _ in session.stream("again", session_id="palette")]
+        await session.shutdown()
+
+        # A transcript the CLI no longer has is dropped and a fresh conversation started.
+        cli.stale = {"sdk-2"}
+        [_ async for _ in session.stream("third", session_id="palette")]
+        await session.shutdown()
+        await store.flush()
+
+    asyncio.run(scenario())
+
+    assert cli.resumes == [None, "sdk-1", "sdk-2", None]
+    assert store.lookup(tmp_path.resolve(), "palette") == "sdk-4"
+
+
+def test_first_query_after_a_restart_resumes_the_stored_conversation(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cli = FakeCli()
+    path = tmp_path / "sessions.json"
+    # Left behind by the previous sidecar process.
+    path.write_text(
+        json.dumps(
+            [
+                {
+                    "workspace": str(tmp_path.resolve()),
+                    "session_id": "palette",
+                    "sdk_session_id": "sdk-old",
+                    "updated": 1.0,
+                }
+            ]
+        ),
+        encoding="utf-8",
+    )
+    store = ResumeStore(path, debounce=0)
+    store.load()
+    monkeypatch.setattr(claude_code_sdk, "ClaudeSDKClient", cli.client)
+    monkeypatch.setattr(claude_service, "resume_store", store)
+    monkeypatch.setattr(
+        claude_service, "McpConfigStore", lambda: McpConfigStore(tmp_path / ".mcp.json")
+    )
+
+    async def scenario() -> None:
+        session = claude_service.ClaudeSession()
+        session.configure(api_key="key", workspace=tmp_path)
+        # Warm-up connects before any query has named a palette session.
+        await session.start()
+        [_ async for _ in session.stream("hi", session_id="palette")]
+        [_ async for _ in session.stream("again", session_id="palette")]
+        await session.shutdown()
+        await store.flush()
+
+    asyncio.run(scenario())
+
+    # One reconnect to resume; the follow-up stays on the now-current client.
+    assert cli.resumes == [None, "sdk-old"]
+    assert store.lookup(tmp_path.resolve(), "palette") == "sdk-2"
+
+
+def test_entries_saved_by_another_worker_are_merged(tmp_path: Path) -> None:
+    path = tmp_path / "sessions.json"
+    workspace = tmp_path / "repo"
+    store = ResumeStore(path, debounce=0)
+    other = ResumeStore(path, debounce=0)
+
+    async def scenario() -> None:
+        store.load()
+        store.record(workspace, "a", "sdk-a")
+        await store.flush()
+        assert store.reload_if_changed() is False
+
+        other.load()
+        other.record(workspace, "a", "sdk-a2")
+        other.record(workspace, "b", "sdk-b")
+        await other.flush()
+
+    asyncio.run(scenario())
+
+    assert store.reload_if_changed() is True
+    assert store.lookup(workspace, "a") == "sdk-a2"
+    assert store.lookup(workspace, "b") == "sdk-b"
@@ -0,0 +1,113 @@
+"""Tests for the debounced, atomic settings store."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from palette_sidecar import config
+from palette_sidecar.config import SettingsStore
+
+
+def test_save_coalesces_bursts_into_one_atomic_write(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "config.json"
+    store = SettingsStore(path, debounce=0.05)
+    writes: list[str] = []
+    real_write = config.atomic_write
+
+    def counting_write(target: Path, content: str) -> None:
+        writes.append(content)
+        real_write(target, content)
+
+    monkeypatch.setattr(config, "atomic_write", counting_write)
+
+    async def scenario() -> None:
+        for index in range(5):
+            store.settings.always_allow.setdefault("Write", []).append(f"/tmp/{index}")
+            store.save()
+        assert writes == []
+        await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+
+    assert len(writes) == 1
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert len(saved["always_allow"]["Write"]) == 5
+    assert [item.name for item in tmp_path.iterdir()] == ["config.json"]
+    assert path.stat().st_mode & 0o777 == 0o600
+
+
+def test_save_during_a_write_is_written_afterwards(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "config.json"
+    store = SettingsStore(path, debounce=0.01)
+    real_write = config.atomic_write
+    writing = threading.Event()
+
+    def slow_write(target: Path, content: str) -> None:
+        writing.set()
+        time.sleep(0.2)
+        real_write(target, content)
+
+    monkeypatch.setattr(config, "atomic_write", slow_write)
+
+    async def scenario() -> None:
+        store.settings.workspace = "/a"
+        store.save()
+        while not writing.is_set():
+            await asyncio.sleep(0.01)
+        store.settings.workspace = "/b"
+        store.save()
+        await asyncio.sleep(0.6)
+
+    asyncio.run(scenario())
+
+    assert json.loads(path.read_text(encoding="utf-8"))["workspace"] == "/b"
+    # Nothing is left pending, so external edits are picked up again.
+    assert store.reload_if_changed() is False
+
+
+def test_flush_writes_pending_changes_immediately(tmp_path: Path) -> None:
+    path = tmp_path / "config.json"
+    store = SettingsStore(path, debounce=60)
+
+    async def scenario() -> None:
+        store.settings.model = "claude-opus-4-1-20250805"
+        store.save()
+        await store.flush()
+
+    asyncio.run(scenario())
+    assert json.loads(path.read_text(encoding="utf-8"))["model"] == "claude-opus-4-1-20250805"
+
+
+def test_reload_picks_up_external_edits_in_place(tmp_path: Path) -> None:
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"workspace": "/tmp/a"}), encoding="utf-8")
+    store = SettingsStore(path)
+    live = store.load()
+    assert live.workspace == "/tmp/a"
+    assert store.reload_if_changed() is False
+
+    path.write_text(json.dumps({"workspace": "/tmp/b"}), encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert store.reload_if_changed() is True
+    assert store.settings is live
+    assert live.workspace == "/tmp/b"
+
+
+def test_corrupt_file_is_set_aside(tmp_path: Path) -> None:
+    path = tmp_path / "config.json"
+    path.write_text('{"workspace": ', encoding="utf-8")
+    store = SettingsStore(path)
+    assert store.load().workspace is None
+    assert (tmp_path / "config.json.corrupt").read_text(encoding="utf-8") == '{"workspace": '
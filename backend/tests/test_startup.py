@@ -0,0 +1,24 @@
+"""Guards against import-time regressions in the sidecar entry point."""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+def test_importing_api_defers_sdk_and_disk_writes(tmp_path: Path) -> None:
+    script = (
+        "import sys, palette_sidecar.api; "
+        "print(sorted(m for m in sys.modules if m.split('.')[0] in ('claude_code_sdk', 'mcp')))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "HOME": str(tmp_path)},
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
+    assert list(tmp_path.iterdir()) == []
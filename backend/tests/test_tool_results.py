@@ -0,0 +1,85 @@
+"""Tests for bounded tool-result delivery."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from palette_sidecar import api
+from palette_sidecar.tool_results import ToolResultStore, parse_range
+
+
+def test_small_results_stay_inline(tmp_path: Path) -> None:
+    store = ToolResultStore(tmp_path, inline_limit=1024)
+    fields = asyncio.run(store.prepare("toolu_1", [{"type": "text", "text": "ok"}]))
+    assert fields == {"content": '[{"type": "text", "text": "ok"}]'}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_large_results_spill_and_serve_ranges(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    store = ToolResultStore(tmp_path, inline_limit=1024)
+    content = [{"type": "text", "text": "é" + "x" * 100_000}]
+    fields = asyncio.run(store.prepare("toolu_big", content))
+
+    assert fields["contentTruncated"] is True
+    assert fields["contentUrl"] == "/tool-result/toolu_big"
+    assert len(fields["content"].encode("utf-8")) <= 1024
+    full = (tmp_path / "toolu_big.txt").read_bytes()
+    assert fields["contentSize"] == len(full)
+
+    monkeypatch.setattr(api, "tool_results", store)
+    client = TestClient(api.app)
+    response = client.get("/tool-result/toolu_big")
+    assert response.status_code == 200
+    assert response.content == full
+    response = client.get("/tool-result/toolu_big", headers={"Range": "bytes=1024-2047"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 1024-2047/{len(full)}"
+    assert response.content == full[1024:2048]
+    response = client.get("/tool-result/toolu_big", headers={"Range": f"bytes={len(full)}-"})
+    assert response.status_code == 416
+    assert client.get("/tool-result/..%2Fconfig").status_code == 404
+
+
+def test_parse_range() -> None:
+    assert parse_range(None, 10) is None
+    assert parse_range("bytes=2-", 10) == (2, 9)
+    assert parse_range("bytes=-3", 10) == (7, 9)
+    assert parse_range("bytes=0-100", 10) == (0, 9)
+    with pytest.raises(ValueError):
+        parse_range("bytes=5-2", 10)
+    with pytest.raises(ValueError):
+        parse_range("items=0-1", 10)
+
+
+def test_store_is_pruned_to_its_size_cap(tmp_path: Path) -> None:
+    store = ToolResultStore(tmp_path, inline_limit=1024, max_bytes=10_000)
+    for index in range(5):
+        asyncio.run(store.prepare(f"toolu_{index}", "y" * 4000))
+    remaining = sorted(path.name for path in tmp_path.iterdir())
+    assert "toolu_4.txt" in remaining
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 10_000
+
+
+def test_result_pruned_after_lookup_is_not_found(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    store = ToolResultStore(tmp_path, inline_limit=1024)
+    asyncio.run(store.prepare("toolu_gone", [{"type": "text", "text": "x" * 10_000}]))
+    path_for = store.path_for
+
+    def pruned_after_lookup(tool_use_id: str) -> Path | None:
+        path = path_for(tool_use_id)
+        assert path is not None
+        path.unlink()
+        return path
+
+    monkeypatch.setattr(store, "path_for", pruned_after_lookup)
+    monkeypatch.setattr(api, "tool_results", store)
+    response = TestClient(api.app).get("/tool-result/toolu_gone")
+    assert response.status_code == 404
@@ -0,0 +1,195 @@
+"""Tests for the workspace digest indexer."""
+
+from __future__ import annotations
+
+import asyncio
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from palette_sidecar import claude_service, workspace_index
+from palette_sidecar.workspace_index import WorkspaceIndexer
+
+
+def _populate(root: Path) -> None:
+    (root / "src").mkdir()
+    (root / "src" / "app.py").write_text(
+        "import os\n\nclass App:\n    def run(self):\n        pass\n\n"
+        "async def main():\n    pass\n",
+        encoding="utf-8",
+    )
+    (root / "README.md").write_text("# Demo\n", encoding="utf-8")
+    (root / "debug.log").write_text("noise\n", encoding="utf-8")
+    (root / "secret").mkdir()
+    (root / "secret" / "token.txt").write_text("x\n", encoding="utf-8")
+    (root / ".gitignore").write_text("*.log\nsecret/\n", encoding="utf-8")
+
+
+def test_digest_is_sorted_filtered_and_byte_stable(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _populate(tmp_path)
+    monkeypatch.setattr(workspace_index, "_git_files", lambda root: None)
+    reads: list[str] = []
+    real_extract = workspace_index._extract_symbols
+
+    def counting_extract(path: Path, language: str | None, size: int) -> tuple[str, ...]:
+        reads.append(path.name)
+        return real_extract(path, language, size)
+
+    monkeypatch.setattr(workspace_index, "_extract_symbols", counting_extract)
+    indexer = WorkspaceIndexer(tmp_path)
+
+    assert indexer.refresh() is True
+    lines = indexer.digest.splitlines()
+    assert lines[2:] == [
+        "Total: 3 files",
+        "Languages: Markdown 1, Python 1",
+        "- .gitignore",
+        "- README.md",
+        "- src/app.py: App, main",
+        "</workspace_digest>",
+    ]
+    first = indexer.digest
+
+    # Not due yet, and nothing changed when forced: same bytes, no re-reads.
+    reads.clear()
+    assert indexer.refresh() is False
+    assert indexer.refresh(force=True) is False
+    assert indexer.digest == first
+    assert reads == []
+
+    # Ordinary edits are re-read but leave the prompt bytes alone.
+    (tmp_path / "README.md").write_text("# Demo workspace\n", encoding="utf-8")
+    assert indexer.refresh(force=True) is False
+    assert reads == ["README.md"]
+    assert indexer.digest == first
+
+    # New symbols and new files change it.
+    (tmp_path / "src" / "app.py").write_text("def serve():\n    pass\n", encoding="utf-8")
+    (tmp_path / "NOTES.md").write_text("notes\n", encoding="utf-8")
+    assert indexer.refresh(force=True) is True
+    assert "- src/app.py: serve" in indexer.digest
+    assert "- NOTES.md" in indexer.digest
+
+
+def test_digest_respects_size_cap(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(workspace_index, "_git_files", lambda root: None)
+    for index in range(50):
+        (tmp_path / f"note-{index:02d}.md").write_text("hello\n", encoding="utf-8")
+    indexer = WorkspaceIndexer(tmp_path, max_bytes=600)
+    indexer.refresh()
+    assert len(indexer.digest.encode("utf-8")) <= 600
+    assert "more files not listed" in indexer.digest
+    assert indexer.digest.endswith("</workspace_digest>")
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+def test_git_workspaces_use_exclude_standard(tmp_path: Path) -> None:
+    _populate(tmp_path)
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    indexer = WorkspaceIndexer(tmp_path)
+    indexer.refresh()
+    assert "src/app.py" in indexer.digest
+    assert "debug.log" not in indexer.digest
+    assert "secret/" not in indexer.digest
+
+
+def test_session_appends_digest_to_system_prompt(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _populate(tmp_path)
+    monkeypatch.setattr(workspace_index, "_git_files", lambda root: None)
+    session = claude_service.ClaudeSession()
+    session.configure(api_key="key", workspace=tmp_path)
+    asyncio.run(session.refresh_workspace_digest())
+
+    prompt = session._build_options().system_prompt
+    assert prompt is not None
+    assert prompt.startswith(claude_service.STEEL_THREAD_SYSTEM_PROMPT + "\n\n<workspace_digest>")
+    assert prompt.endswith("</workspace_digest>")
+
+
+def test_digest_change_waits_for_the_next_reconnect(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _populate(tmp_path)
+    monkeypatch.setattr(workspace_index, "_git_files", lambda root: None)
+    session = claude_service.ClaudeSession()
+    session.configure(api_key="key", workspace=tmp_path)
+    asyncio.run(session.refresh_workspace_digest())
+    session._client = object()  # type: ignore[assignment]
+    session._needs_restart = False
+    session._client_options_key = session._options_key()
+
+    (tmp_path / "extra.py").write_text("def helper():\n    pass\n", encoding="utf-8")
+    assert session._indexer is not None
+    session._indexer._scanned_at = None
+    assert asyncio.run(session.refresh_workspace_digest()) is True
+    # No warm swap is forced; the next client built picks the new digest up.
+    assert session._swap_task is None
+    prompt = session._build_options().system_prompt
+    assert prompt is not None and "- extra.py: helper" in prompt
+
+
+def test_slow_first_scan_does_not_hold_up_the_query(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import threading
+
+    import claude_code_sdk
+
+    from palette_sidecar.mcp_registry import McpConfigStore
+
+    prompts: list[str | None] = []
+    release_scan = threading.Event()
+
+    class FakeClient:
+        def __init__(self, options: claude_code_sdk.ClaudeCodeOptions) -> None:
+            prompts.append(options.system_prompt)
+
+        async def connect(self) -> None:
+            pass
+
+        async def disconnect(self) -> None:
+            pass
+
+        async def query(self, prompt: str, session_id: str = "default") -> None:
+            pass
+
+        async def receive_response(self):
+            yield claude_code_sdk.ResultMessage(
+                subtype="success",
+                duration_ms=1,
+                duration_api_ms=1,
+                is_error=False,
+                num_turns=1,
+                session_id="sdk",
+            )
+
+    def slow_listing(root: Path) -> None:
+        release_scan.wait(5)
+
+    _populate(tmp_path)
+    monkeypatch.setattr(workspace_index, "_git_files", slow_listing)
+    monkeypatch.setattr(claude_service, "INITIAL_DIGEST_BUDGET", 0.05)
+    monkeypatch.setattr(claude_code_sdk, "ClaudeSDKClient", FakeClient)
+    monkeypatch.setattr(
+        claude_service, "McpConfigStore", lambda: McpConfigStore(tmp_path / ".mcp.json")
+    )
+
+    async def scenario() -> None:
+        session = claude_service.ClaudeSession()
+        session.configure(api_key="key", workspace=tmp_path)
+        [_ async for _ in session.stream("hi")]
+        # Connected without the digest while the scan was still running.
+        assert prompts == [claude_service.STEEL_THREAD_SYSTEM_PROMPT]
+        release_scan.set()
+        assert session._index_task is not None
+        assert await session._index_task is True
+        assert "<workspace_digest>" in (session._build_options().system_prompt or "")
+        await session.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,119 @@
+"""Tests for per-workspace Claude sessions."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+import claude_code_sdk
+import pytest
+
+from palette_sidecar import claude_service
+from palette_sidecar.mcp_registry import McpConfigStore
+
+
+class FakeClient:
+    def __init__(self, options: Any, instances: list[FakeClient]) -> None:
+        self.cwd = options.cwd
+        self.release = asyncio.Event()
+        self.queried = asyncio.Event()
+        self.connected = False
+        instances.append(self)
+
+    async def connect(self) -> None:
+        self.connected = True
+
+    async def disconnect(self) -> None:
+        self.connected = False
+
+    async def query(self, prompt: str, session_id: str = "default") -> None:
+        self.queried.set()
+
+    async def receive_response(self):
+        await self.release.wait()
+        yield claude_code_sdk.ResultMessage(
+            subtype="success",
+            duration_ms=1,
+            duration_api_ms=1,
+            is_error=False,
+            num_turns=1,
+            session_id="sdk",
+        )
+
+
+@pytest.fixture
+def clients() -> list[FakeClient]:
+    return []
+
+
+@pytest.fixture
+def sessions(
+    clients: list[FakeClient], tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> claude_service.WorkspaceSessions:
+    monkeypatch.setattr(
+        claude_code_sdk, "ClaudeSDKClient", lambda options: FakeClient(options, clients)
+    )
+    monkeypatch.setattr(
+        claude_service, "McpConfigStore", lambda: McpConfigStore(tmp_path / ".mcp.json")
+    )
+    primary = claude_service.ClaudeSession()
+    primary.configure(api_key="key", workspace=tmp_path / "primary")
+    manager = claude_service.WorkspaceSessions(primary, capacity=3)
+    manager.configure(api_key="key", always_allow={"Write": [str(tmp_path / "a" / "x.md")]})
+    return manager
+
+
+async def _drain(manager: claude_service.WorkspaceSessions, workspace: Path) -> list[str]:
+    async with manager.checkout(workspace) as target:
+        return [event["type"] async for event in target.stream("hi", session_id=workspace.name)]
+
+
+def test_workspaces_stream_in_parallel_with_their_own_clients(
+    sessions: claude_service.WorkspaceSessions, clients: list[FakeClient], tmp_path: Path
+) -> None:
+    async def scenario() -> None:
+        first = asyncio.create_task(_drain(sessions, tmp_path / "a"))
+        second = asyncio.create_task(_drain(sessions, tmp_path / "b"))
+        while len(clients) < 2 or not all(client.queried.is_set() for client in clients):
+            await asyncio.sleep(0.01)
+        # Both queries are in flight at once, each on a client rooted in its workspace.
+        assert sorted(client.cwd for client in clients) == [
+            str(tmp_path / "a"),
+            str(tmp_path / "b"),
+        ]
+        for client in clients:
+            client.release.set()
+        assert await first == ["result"]
+        assert await second == ["result"]
+        # Neither query forced the other's client to restart.
+        assert all(client.connected for client in clients)
+
+        async with sessions.checkout(tmp_path / "a") as target:
+            assert target._allow_rules == {"Write": {str(tmp_path / "a" / "x.md")}}
+        async with sessions.checkout(tmp_path / "b") as target:
+            assert target._allow_rules == {"Write": set()}
+        await sessions.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_least_recently_used_idle_workspace_is_evicted(
+    sessions: claude_service.WorkspaceSessions, clients: list[FakeClient], tmp_path: Path
+) -> None:
+    async def scenario() -> None:
+        for count, name in enumerate(("a", "b", "c"), start=1):
+            task = asyncio.create_task(_drain(sessions, tmp_path / name))
+            while len(clients) < count or not clients[-1].queried.is_set():
+                await asyncio.sleep(0.01)
+            clients[-1].release.set()
+            await task
+        # Capacity 3 leaves room for the primary session plus the two latest workspaces.
+        assert sessions.workspaces == [str(tmp_path / "b"), str(tmp_path / "c")]
+        assert [client.connected for client in clients] == [False, True, True]
+
+        async with sessions.checkout(None) as target:
+            assert target.workspace == (tmp_path / "primary").resolve()
+        await sessions.shutdown()
+
+    asyncio.run(scenario())